@@ -145,7 +145,7 @@ class OffensiveReflexAgent(ReflexCaptureAgent):
 
     if len(foodList) > 0: # This should always be True,  but better safe than sorry
       myPos = successor.getAgentState(self.index).getPosition()
-      minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
+      nearestFood, minDistance = self.distancer.getNearest(myPos, foodList)
       features['distanceToFood'] = minDistance
     return features
 
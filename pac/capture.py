@@ -52,6 +52,7 @@ import imp
 import random
 import sys
 import time
+import weakref
 from typing import Any
 from typing import Self
 from typing import TYPE_CHECKING
@@ -60,7 +61,9 @@ import keyboardAgents
 import mazeGenerator
 from game import Actions
 from game import Agent
+from game import BitGrid
 from game import Configuration
+from game import Directions
 from game import Game
 from game import GameStateData
 from game import Grid
@@ -116,15 +119,19 @@ class GameState:
     """
     return AgentRules.getLegalActions(self, agentIndex)
 
-  def generateSuccessor(self, agentIndex: int, action: 'Action') -> Self:
+  def generateSuccessor(self, agentIndex: int, action: 'Action', validated: bool = False) -> Self:
     """
     Returns the successor state (a GameState object) after the specified agent takes the action.
+
+    Pass validated=True when action is known to be legal, as when it came
+    from getLegalActions on this state, to skip checking it again.  An
+    illegal action is then undefined behaviour.
     """
     # Copy current state
     state = GameState(self)
 
     # Find appropriate rules for the agent
-    AgentRules.applyAction( state, action, agentIndex )
+    AgentRules.applyAction( state, action, agentIndex, validated )
     AgentRules.checkDeath(state, agentIndex)
     AgentRules.decrementTimer(state.data.agentStates[agentIndex])
 
@@ -132,8 +139,56 @@ class GameState:
     state.data._agentMoved = agentIndex
     state.data.score += state.data.scoreChange
     state.data.timeleft = self.data.timeleft - 1
+    state.data.updateKey(self.data)
     return state
 
+  def applyMove(self, agentIndex: int, action: 'Action', validated: bool = False) -> 'MoveRecord':
+    """
+    Makes this state the one generateSuccessor(agentIndex, action) would
+    return, in place, and returns a record for undoMove to change it back.
+    A search can walk its whole tree on one state this way:
+
+      record = state.applyMove(index, action)
+      value = search(state)
+      state.undoMove(record)
+
+    validated is as for generateSuccessor.  Moves must be undone in the
+    reverse order they were applied.  Agent states are changed in place, so
+    copy any you hold on to across applyMove.  The state's hash follows its
+    moves: key tables with hash(state), not with the state itself.
+    """
+    data = self.data
+    record = self._record = MoveRecord(data, agentIndex)
+    try:
+      data._foodEaten = None
+      data._foodAdded = None
+      data._capsuleEaten = None
+      data._lose = False
+      data._win = False
+      data.scoreChange = 0
+
+      AgentRules.applyAction( self, action, agentIndex, validated )
+      AgentRules.checkDeath(self, agentIndex)
+      AgentRules.decrementTimer(data.agentStates[agentIndex])
+
+      data._agentMoved = agentIndex
+      data.score += data.scoreChange
+      data.timeleft -= 1
+      data.updateKey(record, record.agents)
+    except BaseException:
+      # An illegal action leaves the state as it was.
+      record.restore(data)
+      raise
+    finally:
+      self._record = None
+    return record
+
+  def undoMove(self, record: 'MoveRecord') -> None:
+    """
+    Puts back the state as it was before the applyMove that returned record.
+    """
+    record.restore(self.data)
+
   def getAgentState(self, index: int) -> 'AgentState':
     return self.data.agentStates[index]
 
@@ -145,7 +200,7 @@ class GameState:
     agentState = self.data.agentStates[index]
     ret = agentState.getPosition()
     if ret:
-      return tuple(int(x) for x in ret)
+      return (int(ret[0]), int(ret[1]))
     return ret
 
   def getNumAgents(self) -> int:
@@ -163,7 +218,7 @@ class GameState:
     For the matrix m, m[x][y]=true if there is food in (x,y) that belongs to
     red (meaning red is protecting it, blue is trying to eat it).
     """
-    return halfGrid(self.data.food, red = True)
+    return self._getSideFood(red = True)
 
   def getBlueFood(self) -> Grid:
     """
@@ -171,7 +226,34 @@ class GameState:
     For the matrix m, m[x][y]=true if there is food in (x,y) that belongs to
     blue (meaning blue is protecting it, red is trying to eat it).
     """
-    return halfGrid(self.data.food, red = False)
+    return self._getSideFood(red = False)
+
+  def getRedFoodCount(self) -> int:
+    """
+    Returns getRedFood().count(), kept up to date as food is eaten and dumped.
+    """
+    return self.data.foodCounts[0]
+
+  def getBlueFoodCount(self) -> int:
+    """
+    Returns getBlueFood().count(), kept up to date as food is eaten and dumped.
+    """
+    return self.data.foodCounts[1]
+
+  def _getSideFood(self, red: bool) -> Grid:
+    # Both halves are cut out of the food once, and shared by every state
+    # with the same food until a pellet is eaten or dumped.  Callers get a
+    # copy, which costs nothing for a BitGrid, so they may change it.
+    food = self.data.food
+    if not isinstance(food, BitGrid):
+      return halfGrid(food, red)
+    bits, halves = self.data._sideFood
+    if bits is not food.bits:
+      halves = {}
+      self.data._sideFood = (food.bits, halves)
+    if red not in halves:
+      halves[red] = halfGrid(food, red)
+    return halves[red].copy()
 
   def getRedCapsules(self) -> list[tuple[int, int]]:
     return halfList(self.data.capsules, self.data.food, red = True)
@@ -259,17 +341,27 @@ class GameState:
       self.blueTeam: list[int] = prevState.blueTeam
       self.redTeam: list[int] = prevState.redTeam
       self.data.timeleft: int = prevState.data.timeleft
+      self.data.foodCounts: tuple[int, int] = prevState.data.foodCounts
+      self.data.returnedCounts: tuple[int, int] = prevState.data.returnedCounts
+      self.data._sideFood = prevState.data._sideFood
 
       self.teams = prevState.teams
       self.agentDistances = prevState.agentDistances
     else:
       self.data = GameStateData()
       self.agentDistances = []
+    # The MoveRecord of the move applyMove is making, if any.
+    self._record: MoveRecord | None = None
 
   def deepCopy( self ):
-    state = GameState( self )
+    # Costs O(agents): the layout is shared, and copying a BitGrid of food
+    # only shares its int.
+    state = GameState()
     state.data = self.data.deepCopy()
     state.data.timeleft = self.data.timeleft
+    state.data.foodCounts = self.data.foodCounts
+    state.data.returnedCounts = self.data.returnedCounts
+    state.data._sideFood = self.data._sideFood
 
     state.blueTeam = self.blueTeam[:]
     state.redTeam = self.redTeam[:]
@@ -277,14 +369,16 @@ class GameState:
     state.agentDistances = self.agentDistances[:]
     return state
 
-  def makeObservation(self, index: int) -> Self:
-    state = self.deepCopy()
-
+  def makeObservation(self, index: int) -> 'ObservedGameState':
+    """
+    Returns what agent index sees of this state: the sonar readings of every
+    agent, and no configuration for opponents out of its team's sight.  The
+    observation is a read-only view of this state (see ObservedGameState).
+    """
     # Adds the sonar signal
-    pos = state.getAgentPosition(index)
-    n = state.getNumAgents()
-    distances = [noisyDistance(pos, state.getAgentPosition(i)) for i in range(n)]
-    state.agentDistances = distances
+    positions = [self.getAgentPosition(i) for i in range(self.getNumAgents())]
+    pos = positions[index]
+    distances = [noisyDistance(pos, p) for p in positions]
 
     # Remove states of distant opponents
     if index in self.blueTeam:
@@ -294,14 +388,15 @@ class GameState:
       otherTeam = self.blueTeam
       team = self.redTeam
 
+    hidden = []
     for enemy in otherTeam:
       seen = False
-      enemyPos = state.getAgentPosition(enemy)
+      enemyPos = positions[enemy]
       for teammate in team:
-        if manhattanDistance(enemyPos, state.getAgentPosition(teammate)) <= SIGHT_RANGE:
+        if manhattanDistance(enemyPos, positions[teammate]) <= SIGHT_RANGE:
           seen = True
-      if not seen: state.data.agentStates[enemy].configuration = None
-    return state
+      if not seen: hidden.append(enemy)
+    return ObservedGameState(self, hidden, distances)
 
   def __eq__( self, other ) -> bool:
     """
@@ -329,6 +424,10 @@ class GameState:
     self.blueTeam: list[tuple[int, tuple[int, int]]] = [i for i,p in enumerate(positions) if not self.isRed(p)]
     self.redTeam: list[tuple[int, tuple[int, int]]] = [i for i,p in enumerate(positions) if self.isRed(p)]
     self.teams: list[bool] = [self.isRed(p) for p in positions]
+    self.data._sideFood = (None, {})
+    self.data.foodCounts = (self.getRedFood().count(), self.getBlueFood().count())
+    # Food returned home by the red team and by the blue team.
+    self.data.returnedCounts = (0, 0)
     #This is usually 60 (always 60 with random maps)
     #However, if layout map is specified otherwise, it could be less
     global TOTAL_FOOD
@@ -341,8 +440,195 @@ class GameState:
     else:
       return configOrPos.pos[0] < width // 2
 
+class MoveRecord:
+  """
+  What GameState.applyMove needs to undo a move: the fields of the
+  GameStateData that a move can change, as they were before.  A move never
+  changes the food grid or the capsule list it starts with (the rules
+  replace them), so keeping them is enough.  Agent states are changed in
+  place: agents holds (index, configuration, isPacman, scaredTimer,
+  numCarrying, numReturned) as they were for the mover, and for any other
+  agent the rules change (see AgentRules.saveAgent), which only eating a
+  capsule or a death does.
+  """
+  __slots__ = ('agents', 'food', 'capsules', 'score', 'scoreChange', 'timeleft',
+               'foodCounts', 'returnedCounts', '_sideFood', '_key', '_agentMoved',
+               '_foodEaten', '_foodAdded', '_capsuleEaten', '_lose', '_win')
+
+  def __init__(self, data: GameStateData, agentIndex: int):
+    mover = data.agentStates[agentIndex]
+    self.agents = [(agentIndex, mover.configuration, mover.isPacman, mover.scaredTimer,
+                    mover.numCarrying, mover.numReturned)]
+    self.food = data.food
+    self.capsules = data.capsules
+    self.score = data.score
+    self.scoreChange = data.scoreChange
+    self.timeleft = data.timeleft
+    self.foodCounts = data.foodCounts
+    self.returnedCounts = data.returnedCounts
+    self._sideFood = data._sideFood
+    self._key = data._key
+    self._agentMoved = data._agentMoved
+    self._foodEaten = data._foodEaten
+    self._foodAdded = data._foodAdded
+    self._capsuleEaten = data._capsuleEaten
+    self._lose = data._lose
+    self._win = data._win
+
+  def saveAgent(self, index: int, agentState: 'AgentState') -> None:
+    for saved in self.agents:
+      if saved[0] == index: return
+    self.agents.append((index, agentState.configuration, agentState.isPacman,
+                        agentState.scaredTimer, agentState.numCarrying, agentState.numReturned))
+
+  def restore(self, data: GameStateData) -> None:
+    agentStates = data.agentStates
+    for index, configuration, isPacman, scaredTimer, numCarrying, numReturned in self.agents:
+      agentState = agentStates[index]
+      agentState.configuration = configuration
+      agentState.isPacman = isPacman
+      agentState.scaredTimer = scaredTimer
+      agentState.numCarrying = numCarrying
+      agentState.numReturned = numReturned
+    data.food = self.food
+    data.capsules = self.capsules
+    data.score = self.score
+    data.scoreChange = self.scoreChange
+    data.timeleft = self.timeleft
+    data.foodCounts = self.foodCounts
+    data.returnedCounts = self.returnedCounts
+    data._sideFood = self._sideFood
+    data._key = self._key
+    data._agentMoved = self._agentMoved
+    data._foodEaten = self._foodEaten
+    data._foodAdded = self._foodAdded
+    data._capsuleEaten = self._capsuleEaten
+    data._lose = self._lose
+    data._win = self._win
+
+class ObservedGameState(GameState):
+  """
+  A GameState as one agent observes it, made by GameState.makeObservation:
+  the configurations of the opponents in hidden are None, and
+  agentDistances holds the sonar readings.
+
+  It is a view of the state observed rather than a copy.  The accessors
+  below answer from that state, which nothing done through the view
+  changes: agent states are copied on first use, food grids and capsule
+  lists are returned as copies.  Reading data, which generateSuccessor,
+  deepCopy and hashing all do, builds a GameStateData of the observation
+  once, and from then on the accessors answer from it, so that changes
+  made to it are seen; successors and deep copies are ordinary GameStates.
+  A view cannot be changed in place, so applyMove needs a deepCopy of it.
+  """
+
+  def __init__(self, state: GameState, hidden: list[int], agentDistances: list[int]):
+    self._state = state
+    self._hidden = hidden
+    self._agentStates = None
+    self._data = None
+    self.blueTeam = state.blueTeam
+    self.redTeam = state.redTeam
+    self.teams = state.teams
+    self.agentDistances = agentDistances
+
+  @property
+  def data(self) -> GameStateData:
+    if self._data is None:
+      observed = self._state.data
+      data = observed.deepCopy()
+      data.timeleft = observed.timeleft
+      data.foodCounts = observed.foodCounts
+      data.returnedCounts = observed.returnedCounts
+      data._sideFood = observed._sideFood
+      data.agentStates = self._getAgentStates()
+      data.updateKey(observed)
+      self._data = data
+    return self._data
+
+  def _observed(self) -> GameState:
+    # Until data is built nothing can have changed the view, so the state
+    # observed answers.  Once built, data may have been changed: the view
+    # then answers from it, as any GameState does.
+    return self._state if self._data is None else super()
+
+  def _getAgentStates(self) -> list['AgentState']:
+    if self._data is not None:
+      return self._data.agentStates
+    if self._agentStates is None:
+      agentStates = self._state.data.copyAgentStates( self._state.data.agentStates )
+      for enemy in self._hidden:
+        agentStates[enemy].configuration = None
+      self._agentStates = agentStates
+    return self._agentStates
+
+  def getLegalActions(self, agentIndex: int = 0) -> list['Action']:
+    if agentIndex in self._hidden:
+      return GameState.getLegalActions(self, agentIndex)
+    return self._observed().getLegalActions(agentIndex)
+
+  def applyMove(self, agentIndex: int, action: 'Action', validated: bool = False) -> 'MoveRecord':
+    raise TypeError('observations are read-only; apply moves to a deepCopy()')
+
+  def getAgentState(self, index: int) -> 'AgentState':
+    return self._getAgentStates()[index]
+
+  def getAgentPosition(self, index: int) -> tuple[int, int]:
+    ret = self._getAgentStates()[index].getPosition()
+    if ret:
+      return (int(ret[0]), int(ret[1]))
+    return ret
+
+  def getNumAgents(self) -> int:
+    return self._observed().getNumAgents()
+
+  def getScore(self) -> int:
+    return self._observed().getScore()
+
+  def getRedFood(self) -> Grid:
+    return self._observed().getRedFood()
+
+  def getBlueFood(self) -> Grid:
+    return self._observed().getBlueFood()
+
+  def getRedFoodCount(self) -> int:
+    return self._observed().getRedFoodCount()
+
+  def getBlueFoodCount(self) -> int:
+    return self._observed().getBlueFoodCount()
+
+  def getRedCapsules(self) -> list[tuple[int, int]]:
+    return self._observed().getRedCapsules()
+
+  def getBlueCapsules(self) -> list[tuple[int, int]]:
+    return self._observed().getBlueCapsules()
+
+  def getWalls(self) -> Grid:
+    return self._observed().getWalls()
+
+  def hasFood(self, x: int, y: int) -> bool:
+    return self._observed().hasFood(x, y)
+
+  def hasWall(self, x: int, y: int) -> bool:
+    return self._observed().hasWall(x, y)
+
+  def isOver(self) -> bool:
+    return self._observed().isOver()
+
+  def getInitialAgentPosition(self, agentIndex: int) -> tuple[int, int]:
+    return self._observed().getInitialAgentPosition(agentIndex)
+
+  def getCapsules(self) -> list[tuple[int, int]]:
+    return self._observed().getCapsules()[:]
+
 def halfGrid(grid: Grid, red: bool) -> Grid:
   halfway = grid.width // 2
+  if isinstance(grid, BitGrid):
+    # The red half is the low halfway * height bits.
+    redBits = (1 << (halfway * grid.height)) - 1
+    halfgrid = BitGrid(grid.width, grid.height)
+    halfgrid.bits = grid.bits & redBits if red else grid.bits & ~redBits
+    return halfgrid
   halfgrid = Grid(grid.width, grid.height, False)
   if red:    xrange = range(halfway)
   else:       xrange = range(halfway, grid.width)
@@ -395,8 +681,8 @@ class CaptureRules:
     game.state.data.timeleft = length
     if 'drawCenterLine' in dir(display):
       display.drawCenterLine()
-    self._initBlueFood = initState.getBlueFood().count()
-    self._initRedFood = initState.getRedFood().count()
+    self._initBlueFood = initState.getBlueFoodCount()
+    self._initRedFood = initState.getRedFoodCount()
     return game
 
   def process(self, state: GameState, game: Game) -> None:
@@ -410,16 +696,8 @@ class CaptureRules:
     if state.isOver():
       game.gameOver = True
       if not game.rules.quiet:
-        redCount = 0
-        blueCount = 0
+        redCount, blueCount = state.data.returnedCounts
         foodToWin = (TOTAL_FOOD/2) - MIN_FOOD
-        for index in range(state.getNumAgents()):
-          agentState = state.data.agentStates[index]
-          if index in state.getRedTeamIndices():
-            redCount += agentState.numReturned
-          else:
-            blueCount += agentState.numReturned
-        
         if blueCount >= foodToWin:#state.getRedFood().count() == MIN_FOOD:
           print ('The Blue team has returned at least %d of the opponents\' dots.' % foodToWin)
         elif redCount >= foodToWin:#state.getBlueFood().count() == MIN_FOOD:
@@ -433,8 +711,8 @@ class CaptureRules:
             print ('The %s team wins by %d points.' % (winner, abs(state.data.score)))
 
   def getProgress(self, game: Game) -> float:
-    blue = 1.0 - (game.state.getBlueFood().count() / float(self._initBlueFood))
-    red = 1.0 - (game.state.getRedFood().count() / float(self._initRedFood))
+    blue = 1.0 - (game.state.getBlueFoodCount() / float(self._initBlueFood))
+    red = 1.0 - (game.state.getRedFoodCount() / float(self._initRedFood))
     moves = len(self.moveHistory) / float(game.length)
 
     # return the most likely progress indicator, clamped to [0, 1]
@@ -475,30 +753,56 @@ class AgentRules:
     """
     agentState = state.getAgentState(agentIndex)
     conf = agentState.configuration
-    possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
+    moves = state.data.layout.getLegalMoves().get(conf.pos)
+    if moves is None:
+      possibleActions = Actions.getPossibleActions( conf, state.data.layout.walls )
+    else:
+      possibleActions = list(moves[0])
     return AgentRules.filterForAllowedActions( agentState, possibleActions)
 
+  @staticmethod
+  def saveAgent(state: GameState, index: int) -> None:
+    """
+    Call before changing any agent but the one moving, so that undoMove
+    can put it back when the move is being made by applyMove.
+    """
+    if state._record is not None:
+      state._record.saveAgent(index, state.data.agentStates[index])
+
   @staticmethod
   def filterForAllowedActions(agentState: 'AgentState', possibleActions: list['Action']) -> list['Action']:
     return possibleActions
 
 
   @staticmethod
-  def applyAction(state: GameState, action: 'Action', agentIndex: int) -> None:
+  def applyAction(state: GameState, action: 'Action', agentIndex: int, validated: bool = False) -> None:
     """
-    Edits the state to reflect the results of the action.
+    Edits the state to reflect the results of the action.  Unless
+    validated, the action is checked to be legal first.
     """
-    legal = AgentRules.getLegalActions( state, agentIndex )
-    if action not in legal:
-      raise Exception("Illegal action " + str(action))
-
-    # Update Configuration
     agentState = state.data.agentStates[agentIndex]
-    speed = 1.0
-    # if agentState.isPacman: speed = 0.5
-    vector = Actions.directionToVector( action, speed )
     oldConfig = agentState.configuration
-    agentState.configuration = oldConfig.generateSuccessor( vector )
+    moves = state.data.layout.getLegalMoves().get(oldConfig.pos)
+    if moves is not None:
+      # filterForAllowedActions allows every possible action, so the move
+      # table alone decides.
+      successors = moves[1]
+      if not validated and action not in successors:
+        raise Exception("Illegal action " + str(action))
+      # Stopping keeps the direction, as generateSuccessor does.
+      direction = oldConfig.direction if action == Directions.STOP else action
+      agentState.configuration = Configuration.intern( successors[action], direction )
+    else:
+      if not validated:
+        legal = AgentRules.getLegalActions( state, agentIndex )
+        if action not in legal:
+          raise Exception("Illegal action " + str(action))
+
+      # Update Configuration
+      speed = 1.0
+      # if agentState.isPacman: speed = 0.5
+      vector = Actions.directionToVector( action, speed )
+      agentState.configuration = oldConfig.generateSuccessor( vector )
 
     # Eat
     next = agentState.configuration.getPosition()
@@ -515,18 +819,20 @@ class AgentRules:
         state.data.scoreChange += score
 
         agentState.numReturned += agentState.numCarrying
+        redCount, blueCount = state.data.returnedCounts
+        if isRed:
+          redCount += agentState.numCarrying
+        else:
+          blueCount += agentState.numCarrying
+        state.data.returnedCounts = (redCount, blueCount)
         agentState.numCarrying = 0
 
-        redCount = 0
-        blueCount = 0
-        for index in range(state.getNumAgents()):
-          agentState = state.data.agentStates[index]
-          if index in state.getRedTeamIndices():
-            redCount += agentState.numReturned
-          else:
-            blueCount += agentState.numReturned
         if redCount >= (TOTAL_FOOD/2) - MIN_FOOD or blueCount >= (TOTAL_FOOD/2) - MIN_FOOD:
           state.data._win = True
+        # The loop that used to add up the returned food here left
+        # agentState naming the last agent, and the check for eating below
+        # has always looked at that one.
+        agentState = state.data.agentStates[-1]
 
 
     if agentState.isPacman and manhattanDistance( nearest, next ) <= 0.9 :
@@ -548,9 +854,10 @@ class AgentRules:
         teamIndicesFunc = state.getRedTeamIndices
 
       # go increase the variable for the pacman who ate this
-      agents = [state.data.agentStates[agentIndex] for agentIndex in teamIndicesFunc()]
-      for agent in agents:
+      for agentIndex in teamIndicesFunc():
+        agent = state.data.agentStates[agentIndex]
         if agent.getPosition() == position:
+          AgentRules.saveAgent(state, agentIndex)
           agent.numCarrying += 1
           break # the above should only be true for one agent...
 
@@ -559,6 +866,11 @@ class AgentRules:
       state.data.food = state.data.food.copy()
       state.data.food[x][y] = False
       state.data._foodEaten = position
+      redCount, blueCount = state.data.foodCounts
+      if state.isRed(position):
+        state.data.foodCounts = (redCount - 1, blueCount)
+      else:
+        state.data.foodCounts = (redCount, blueCount - 1)
       #if (isRed and state.getBlueFood().count() == MIN_FOOD) or (not isRed and state.getRedFood().count() == MIN_FOOD):
       #  state.data._win = True
 
@@ -566,13 +878,15 @@ class AgentRules:
     if isRed: myCapsules = state.getBlueCapsules()
     else: myCapsules = state.getRedCapsules()
     if( position in myCapsules ):
-      state.data.capsules.remove( position )
+      # A new list, so that GameState.undoMove can put back the old one.
+      state.data.capsules = [c for c in state.data.capsules if c != position]
       state.data._capsuleEaten = position
 
       # Reset all ghosts' scared timers
       if isRed: otherTeam = state.getBlueTeamIndices()
       else: otherTeam = state.getRedTeamIndices()
       for index in otherTeam:
+        AgentRules.saveAgent(state, index)
         state.data.agentStates[index].scaredTimer = SCARED_TIME
 
 
@@ -580,7 +894,8 @@ class AgentRules:
   def decrementTimer(state: GameState) -> None:
     timer = state.scaredTimer
     if timer == 1:
-      state.configuration.pos = nearestPoint( state.configuration.pos )
+      config = state.configuration
+      state.configuration = Configuration( nearestPoint( config.pos ), config.direction )
     state.scaredTimer = max( 0, timer - 1 )
 
   @staticmethod
@@ -608,77 +923,30 @@ class AgentRules:
     scoreDirection = (-1)**(int(isRed) + 1)
     #state.data.scoreChange += scoreDirection * agentState.numCarrying
 
-    def onRightSide(state: GameState, x: int, y: int) -> bool:
-      dummyConfig = Configuration((x, y), 'North')
-      return state.isRed(dummyConfig) == isRed
-
-    # we have food to dump
-    # -- expand out in BFS. Check:
-    #   - that it's within the limits
-    #   - that it's not a wall
-    #   - that no other agents are there
-    #   - that no power pellets are there
-    #   - that it's on the right side of the grid
-    def allGood(state: GameState, x: int, y: int) -> bool:
-      width, height = state.data.layout.width, state.data.layout.height
-      food, walls = state.data.food, state.data.layout.walls
-
-      # bounds check
-      if x >= width or y >= height or x <= 0 or y <= 0:
-        return False
-
-      if walls[x][y]:
-        return False
-      if food[x][y]:
-        return False
-
-      # dots need to be on the side where this agent will be a pacman :P
-      if not onRightSide(state, x, y):
-        return False
-
-      if (x,y) in state.data.capsules:
-        return False
-
-      # loop through agents
-      agentPoses = [state.getAgentPosition(i) for i in range(state.getNumAgents())]
-      if (x,y) in agentPoses:
-        return False
-
-      return True
-
-    numToDump = agentState.numCarrying
-    state.data.food = state.data.food.copy()
+    # we have food to dump, on the cells of getDumpOrder from where the
+    # agent died, skipping those that already hold food, a power pellet or
+    # an agent
+    occupied = set(state.data.capsules)
+    occupied.update(state.getAgentPosition(i) for i in range(state.getNumAgents()))
+    x, y = agentState.getPosition()
+    food = state.data.food = state.data.food.copy()
     foodAdded = []
-
-    def genSuccessors(x: int, y: int) -> list[tuple[int, int]]:
-      DX = [-1, 0, 1]
-      DY = [-1, 0, 1]
-      return [(x + dx, y + dy) for dx in DX for dy in DY]
-
-    # BFS graph search
-    positionQueue = [agentState.getPosition()]
-    seen = set()
-    while numToDump > 0:
-      if not len(positionQueue):
-        raise Exception('Exhausted BFS! uh oh')
-      # pop one off, graph check
-      popped = positionQueue.pop(0)
-      if popped in seen:
+    for x, y in getDumpOrder(state.data.layout, (int(x), int(y))):
+      if food[x][y] or (x, y) in occupied:
         continue
-      seen.add(popped)
-
-      x, y = popped[0], popped[1]
-      x = int(x)
-      y = int(y)
-      if (allGood(state, x, y)):
-        state.data.food[x][y] = True
-        foodAdded.append((x, y))
-        numToDump -= 1
-
-      # generate successors
-      positionQueue = positionQueue + genSuccessors(x, y)
+      food[x][y] = True
+      foodAdded.append((x, y))
+      if len(foodAdded) == agentState.numCarrying:
+        break
+    else:
+      raise Exception('Exhausted BFS! uh oh')
 
     state.data._foodAdded = foodAdded
+    redCount, blueCount = state.data.foodCounts
+    if isRed:
+      state.data.foodCounts = (redCount + len(foodAdded), blueCount)
+    else:
+      state.data.foodCounts = (redCount, blueCount + len(foodAdded))
     # now our agentState is no longer carrying food
     agentState.numCarrying = 0
     pass
@@ -714,6 +982,7 @@ class AgentRules:
             if state.isOnRedTeam(agentIndex):
               score = -score
             state.data.scoreChange += score
+            AgentRules.saveAgent(state, index)
             otherAgentState.isPacman = False
             otherAgentState.configuration = otherAgentState.start
             otherAgentState.scaredTimer = 0
@@ -726,6 +995,7 @@ class AgentRules:
         if manhattanDistance( pacPos, agentState.getPosition() ) <= COLLISION_TOLERANCE:
           #award points to the other team for killing Pacmen
           if agentState.scaredTimer <= 0:
+            AgentRules.saveAgent(state, index)
             AgentRules.dumpFoodFromDeath(state, otherAgentState, agentIndex)
 
             score = KILL_POINTS
@@ -748,6 +1018,54 @@ class AgentRules:
   def placeGhost(state: GameState, ghostState: 'AgentState') -> None:
     ghostState.configuration = ghostState.start
 
+# Cell orders of getDumpOrder, per layout and by cell.
+_dumpOrders = weakref.WeakKeyDictionary()
+# Offsets from the dying Pacman in search order, and their ranks in it.
+_dumpOffsets = [(0, 0)]
+_dumpRanks = {(0, 0): 0}
+
+def getDumpOrder(layout: Layout, position: tuple[int, int]) -> list[tuple[int, int]]:
+  """
+  Returns the cells a Pacman dying at position drops its food on, in order:
+  breadth first over the eight neighbours of every cell, from position
+  outwards, keeping the open cells inside the border on the same side as
+  position.  The search goes through walls, so the order is the same
+  sequence of offsets from every cell (see getDumpRanks).
+
+  Orders are made the first time a Pacman dies on a cell, and kept with
+  the layout.
+  """
+  orders = _dumpOrders.setdefault(layout, {})
+  if position not in orders:
+    x0, y0 = position
+    width, height, walls = layout.width, layout.height, layout.walls
+    red = x0 < width // 2
+    xs = range(1, width // 2) if red else range(width // 2, width)
+    ranks = getDumpRanks(max(width, height))
+    order = [(x, y) for x in xs for y in range(1, height) if not walls[x][y]]
+    order.sort(key=lambda cell: ranks[cell[0] - x0, cell[1] - y0])
+    orders[position] = order
+  return orders[position]
+
+def getDumpRanks(radius: int) -> dict[tuple[int, int], int]:
+  """
+  Numbers every offset at most radius steps away (in any of the eight
+  directions) in breadth first order from (0, 0), neighbours being visited
+  in the order of dx then dy, both from -1 to 1.  Larger radii only add
+  offsets after the ones already numbered.
+  """
+  while len(_dumpOffsets) < (2 * radius + 1) ** 2:
+    # One more ring: every offset of it is first reached from the ring inside.
+    ring = max(abs(_dumpOffsets[-1][0]), abs(_dumpOffsets[-1][1]))
+    for x, y in _dumpOffsets[(2 * ring - 1) ** 2 if ring else 0:]:
+      for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+          offset = (x + dx, y + dy)
+          if offset not in _dumpRanks:
+            _dumpRanks[offset] = len(_dumpOffsets)
+            _dumpOffsets.append(offset)
+  return _dumpRanks
+
 #############################
 # FRAMEWORK TO START A GAME #
 #############################
@@ -1033,15 +1351,8 @@ def replayGame(layout: Layout,
 
     game.gameOver = True
     if not game.rules.quiet:
-      redCount = 0
-      blueCount = 0
+      redCount, blueCount = state.data.returnedCounts
       foodToWin = (TOTAL_FOOD/2) - MIN_FOOD
-      for index in range(state.getNumAgents()):
-        agentState = state.data.agentStates[index]
-        if index in state.getRedTeamIndices():
-          redCount += agentState.numReturned
-        else:
-          blueCount += agentState.numReturned
 
       if blueCount >= foodToWin:#state.getRedFood().count() == MIN_FOOD:
         print('The Blue team has returned at least %d of the opponents\' dots.' % foodToWin)
@@ -20,6 +20,8 @@ from typing import Self
 from typing import TYPE_CHECKING
 
 import distanceCalculator
+import landmarks
+import mazeTopology
 import util
 from game import Agent
 
@@ -58,6 +60,11 @@ class CaptureAgent(Agent):
   Recommended Usage:  Subclass CaptureAgent and override chooseAction.
   """
 
+  # Set to True to compute maze distances a little at a time, spending
+  # timeForComputing seconds at startup and on every turn, with Manhattan
+  # distances standing in meanwhile.  Lets agents start at once on huge mazes.
+  anytimeDistances: bool = False
+
   #############################
   # Methods to store key info #
   #############################
@@ -92,6 +99,14 @@ class CaptureAgent(Agent):
     # Time to spend each turn on computing maze distances
     self.timeForComputing: float = timeForComputing
 
+    # Subscribed distance fields, by name (see subscribeDistanceField)
+    self.distanceFields: dict[str, distanceCalculator.DistanceField] = {}
+    self._distanceFieldMembers = {}
+
+    # Built on first use by getMazeTopology and getLandmarks
+    self._topology: mazeTopology.MazeTopology = None
+    self._landmarks: landmarks.Landmarks = None
+
     # Access to the graphics
     self.display: 'Graphics' = None
 
@@ -109,7 +124,10 @@ class CaptureAgent(Agent):
     self.distancer = distanceCalculator.Distancer(gameState.data.layout)
 
     # comment this out to forgo maze distance computation and use manhattan distances
-    self.distancer.getMazeDistances()
+    if self.anytimeDistances:
+      self.distancer.getMazeDistances(timeLimit=self.timeForComputing)
+    else:
+      self.distancer.getMazeDistances()
 
     import __main__
     if '_display' in dir(__main__):
@@ -160,6 +178,11 @@ class CaptureAgent(Agent):
     """
     self.observationHistory.append(gameState)
 
+    if self.anytimeDistances and not self.distancer.isReadyForMazeDistance():
+      self.distancer.resumeMazeDistances(self.timeForComputing)
+
+    self.updateDistanceFields(gameState)
+
     myState = gameState.getAgentState(self.index)
     myPos = myState.getPosition()
     if myPos != util.nearestPoint(myPos):
@@ -254,6 +277,87 @@ class CaptureAgent(Agent):
     d = self.distancer.getDistance(pos1, pos2)
     return d
 
+  def getMazeTopology(self) -> mazeTopology.MazeTopology:
+    """
+    Returns the mazeTopology.MazeTopology of the layout: dead-end depths,
+    corridors, articulation points and chokepoints.  It is computed once
+    per layout and cached like the maze distances.
+    """
+    if self._topology is None:
+      self._topology = mazeTopology.MazeTopology(self.distancer.dc.layout)
+    return self._topology
+
+  def getLandmarks(self) -> landmarks.Landmarks:
+    """
+    Returns the landmarks.Landmarks of the layout, whose lower bounds on
+    maze distances make good A* heuristics, e.g.
+    aStarSearch(problem, self.getLandmarks().positionHeuristic(goal)).
+    """
+    if self._landmarks is None:
+      self._landmarks = landmarks.Landmarks(self.distancer.dc.layout)
+    return self._landmarks
+
+  def getHomeDistance(self, pos1, pos2):
+    """
+    Returns the length of the shortest path between two points of your own
+    half that never crosses into the opponent's half, so a defender never
+    becomes a Pacman on the way.  None if either point is not on your half.
+    """
+    return self.distancer.getSideDistance(pos1, pos2, self.red)
+
+  def getEnemySideDistance(self, pos1, pos2):
+    """
+    Returns the length of the shortest path between two points of the
+    opponent's half that stays on it.  None if either point is not there.
+    """
+    return self.distancer.getSideDistance(pos1, pos2, not self.red)
+
+  def getDistanceToHome(self, pos):
+    """
+    Returns the maze distance from pos to the nearest cell of your half on
+    the center line: how far a Pacman at pos is from banking its food.
+    """
+    return self.distancer.getBorderDistance(pos, self.red)
+
+  def subscribeDistanceField(self, gameState, name, getMembers=None):
+    """
+    Keeps a distanceCalculator.DistanceField of the distance from every cell
+    to the nearest of a set of positions, updated at the start of every
+    turn.  Read it with getFieldDistance(name, pos).
+
+    getMembers(gameState) returns the positions, as a list or a food grid.
+    It can be left out for the names 'food', 'defendedFood', 'capsules' and
+    'defendedCapsules', which use getFood, getFoodYouAreDefending,
+    getCapsules and getCapsulesYouAreDefending.
+    """
+    if getMembers is None:
+      getMembers = {'food': self.getFood,
+                    'defendedFood': self.getFoodYouAreDefending,
+                    'capsules': self.getCapsules,
+                    'defendedCapsules': self.getCapsulesYouAreDefending}[name]
+    self._distanceFieldMembers[name] = getMembers
+    self.distanceFields[name] = distanceCalculator.DistanceField(gameState.data.layout)
+    self.updateDistanceFields(gameState)
+
+  def updateDistanceFields(self, gameState):
+    """
+    Brings the subscribed distance fields up to date with gameState.  Only
+    the positions that were added or removed since the last update are
+    processed.
+    """
+    for name, getMembers in self._distanceFieldMembers.items():
+      members = getMembers(gameState)
+      if hasattr(members, 'asList'):
+        members = members.asList()
+      self.distanceFields[name].update(members)
+
+  def getFieldDistance(self, name, pos):
+    """
+    Returns the maze distance from pos to the nearest position of the
+    subscribed distance field name, or None if there is none.
+    """
+    return self.distanceFields[name].getDistance(pos)
+
   def getPreviousObservation(self):
     """
     Returns the GameState object corresponding to the last state this agent saw
@@ -1,4 +1,5 @@
 import capture
+import distanceCalculator
 import layout
 import textDisplay
 from captureAgents import CaptureAgent
@@ -498,6 +499,24 @@ def getRandomLayout() -> str:
     return random_layout
 
 
+def share_layout_tables(args: argparse.Namespace) -> list[tuple]:
+    """
+    Compute the maze distance tables of the competition layout once, and
+    publish them in shared memory for the match runners.
+
+    Random layouts are generated from their seed, exactly as
+    update_arguments does for every game, without disturbing the random
+    state the match runners inherit.
+    """
+    if args.layout_type[0] == "random":
+        random_state = random.getstate()
+        _layout = layout.Layout(capture.randomLayout(args.layout_type[1]).split('\n'))
+        random.setstate(random_state)
+    else:
+        _layout = args.layout_type[1]
+    return distanceCalculator.shareTables(_layout)
+
+
 def update_arguments(args: argparse.Namespace,
                      red_name: str, red_agents: list[CaptureAgent],
                      blue_name: str, blue_agents: list[CaptureAgent]) -> dict[str, Any]:
@@ -1486,6 +1505,9 @@ def run_match(runner_id: int, args: argparse.Namespace, output_dir: str,
     for the matches in match_queue, a multiprocessing.Queue.  Results of
     capture.runGames are put into results, another multiprocessing.Queue.
     """
+    # Use the distance tables share_layout_tables published, read-only and
+    # without a copy, rather than computing or loading them again.
+    distanceCalculator.attachTables(args.shared_tables)
     while not match_queue.empty():
         try:
             matchno = match_queue.qsize()
@@ -1659,23 +1681,27 @@ def run_competition(args: argparse.Namespace) -> None:
         results = multiprocessing.Queue()
         is_done = multiprocessing.Queue()
         logging.info(f"A total of {matches.qsize()} matches will be played. Counting down")
-        for i in range(args.threads):
-            p = multiprocessing.Process(target=run_match,
-                    args=(i, args, output_dir, matches, results, is_done))
-            match_runners[i] = p
-            p.start()
-
-        while match_runners:
-            if not is_done.empty():
-                name = is_done.get(timeout=1)
-                match_runners[name].join()
-                del match_runners[name]
-            # Periodically move results to scoreboard, so that results is not overflowing.
-            while not results.empty():
-                scoreboard.add_result(*results.get())
-            if args.display_type != 'super_quiet':
-                print(loading_bar.format(len(scoreboard)), end='')
-            time.sleep(0.1)
+        args.shared_tables = share_layout_tables(args)
+        try:
+            for i in range(args.threads):
+                p = multiprocessing.Process(target=run_match,
+                        args=(i, args, output_dir, matches, results, is_done))
+                match_runners[i] = p
+                p.start()
+
+            while match_runners:
+                if not is_done.empty():
+                    name = is_done.get(timeout=1)
+                    match_runners[name].join()
+                    del match_runners[name]
+                # Periodically move results to scoreboard, so that results is not overflowing.
+                while not results.empty():
+                    scoreboard.add_result(*results.get())
+                if args.display_type != 'super_quiet':
+                    print(loading_bar.format(len(scoreboard)), end='')
+                time.sleep(0.1)
+        finally:
+            distanceCalculator.releaseTables(args.shared_tables)
         if args.display_type != 'super_quiet':
             print("")
 
@@ -19,9 +19,25 @@ caches the shortest path between any two points in the maze.
 Example:
 distancer = Distancer(gameState.data.layout)
 distancer.getDistance( (1,1), (10,10) )
+
+Distances are stored in a dense matrix indexed by the open cells of the
+layout (see CellIndex), so a lookup is two dict reads and an array read.
+
+Computed tables are also kept on disk, in CACHE_DIR, keyed by a hash of the
+layout's walls, so later processes playing the same map memory-map them
+instead of recomputing.  CACHE_DIR is pacman-distances in the user's cache
+directory ($XDG_CACHE_HOME, or ~/.cache).  Set the PACMAN_DISTANCE_CACHE
+environment variable to choose another directory, or to the empty string to
+disable the cache.  A directory that is not the user's own, or that others
+may write to, is never used.
 """
 
-import sys, time, random
+import hashlib, heapq, os, stat, sys, tempfile, threading, time, random
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from game import Directions
 
 class Distancer:
   def __init__(self, layout, default = 10000):
@@ -29,17 +45,47 @@ class Distancer:
     Initialize with Distancer(layout).  Changing default is unnecessary.
     """
     self._distances = None
+    self._nextHops = None
+    self._sideTables = {}
+    self._cells = None
     self.default = default
     self.dc = DistanceCalculator(layout, self, default)
 
-  def getMazeDistances(self):
-    self.dc.run()
+  def getMazeDistances(self, timeLimit=None, background=False):
+    """
+    Computes the maze distances, blocking until all are known.
+
+    For an anytime start, pass timeLimit to spend at most that many seconds
+    now and continue with resumeMazeDistances later, or background=True to
+    have a thread compute them.  Until they are done, getDistance is exact
+    for pairs involving a cell whose distances are known, and Manhattan
+    distance otherwise.  Distances that are cached are available at once.
+    """
+    self.dc.run(timeLimit, background)
+
+  def resumeMazeDistances(self, timeLimit):
+    """
+    Spends at most timeLimit seconds on the maze distances left over by
+    getMazeDistances(timeLimit=...).  Does nothing in any other case.
+    """
+    if self.dc.rows is not None and self.dc.thread is None:
+      self.dc.resume(timeLimit)
+
+  def getMazeDistanceProgress(self):
+    """
+    Returns the fraction of cells whose distances are known.
+    """
+    if self._distances is not None:
+      return 1.0
+    if self.dc.rows is None or len(self.dc.rows) == 0:
+      return 0.0
+    return self.dc.rowsDone / len(self.dc.rows)
 
   def getDistance(self, pos1, pos2):
     """
     The getDistance function is the only one you'll need after you create the object.
     """
-    if self._distances == None:
+    if self._distances is None and self.dc.rows is None:
       return manhattanDistance(pos1, pos2)
     if isInt(pos1) and isInt(pos2):
       return self.getDistanceOnGrid(pos1, pos2)
@@ -55,14 +101,277 @@ class Distancer:
     return bestDistance
 
   def getDistanceOnGrid(self, pos1, pos2):
-    key = (pos1, pos2)
-    if key in self._distances:
-      return self._distances[key]
+    index = self._cells.index
+    if pos1 in index and pos2 in index:
+      if self._distances is None:
+        return self._getPartialDistance(pos1, pos2)
+      distance = int(tableEntry(self._distances, index[pos1], index[pos2]))
+      if distance == UNREACHABLE:
+        return sys.maxsize
+      return distance
     else:
-      raise Exception("Positions not in grid: " + str(key))
+      raise Exception("Positions not in grid: " + str((pos1, pos2)))
+
+  def _getPartialDistance(self, pos1, pos2):
+    # The first rowsDone rows of the table being filled in are exact.
+    i, j = self._cells.index[pos1], self._cells.index[pos2]
+    rows, rowsDone = self.dc.rows, self.dc.rowsDone
+    if storedRow(rows, i) < rowsDone:
+      distance = int(tableEntry(rows, i, j))
+    elif storedRow(rows, j) < rowsDone:
+      distance = int(tableEntry(rows, j, i))
+    else:
+      return manhattanDistance(pos1, pos2)
+    if distance == UNREACHABLE:
+      return sys.maxsize
+    return distance
 
   def isReadyForMazeDistance(self):
-    return self._distances != None
+    return self._distances is not None
+
+  #################
+  # Batch queries #
+  #################
+
+  def getDistances(self, pos, targets):
+    """
+    Returns an array with the distance from pos to each of targets, in
+    order.  For grid positions this reads a single row of the distance
+    table instead of doing one lookup per target.
+    """
+    targets = list(targets)
+    if self._distances is not None:
+      index = self._cells.index
+      try:
+        row, columns = index[pos], [index[target] for target in targets]
+      except KeyError:
+        pass # Half positions; handled one by one below
+      else:
+        distances = tableRow(self._distances, row)[columns].astype(np.int64)
+        distances[distances == UNREACHABLE] = sys.maxsize
+        return distances
+    return np.array([self.getDistance(pos, target) for target in targets])
+
+  def getNearest(self, pos, targets):
+    """
+    Returns (target, distance) for the target closest to pos, the first one
+    in targets on ties, or (None, None) if there are no targets.
+    """
+    targets = list(targets)
+    if not targets:
+      return None, None
+    distances = self.getDistances(pos, targets)
+    best = int(np.argmin(distances))
+    return targets[best], distances[best].item()
+
+  def getKNearest(self, pos, targets, k):
+    """
+    Returns a list of (target, distance) for the k targets closest to pos,
+    nearest first.  Ties keep the order of targets.
+    """
+    targets = list(targets)
+    distances = self.getDistances(pos, targets)
+    order = np.argsort(distances, kind='stable')[:k]
+    return [(targets[i], distances[i].item()) for i in order]
+
+  ##################
+  # Path following #
+  ##################
+
+  def getNextAction(self, pos, target):
+    """
+    Returns the first action of a shortest path from pos to target:
+    Directions.STOP when already there, and None if target cannot be
+    reached.  Between equally short paths, North is preferred over South,
+    East and West, in that order, like the order of getLegalActions.
+    """
+    self._loadNextHops()
+    index = self._cells.index
+    if pos not in index or target not in index:
+      raise Exception("Positions not in grid: " + str((pos, target)))
+    if pos == target:
+      return Directions.STOP
+    hop = hopEntry(self._nextHops, index[pos], index[target])
+    if hop < 0:
+      return None
+    return NEIGHBOR_DIRECTIONS[hop]
+
+  def getPath(self, pos, target):
+    """
+    Returns the list of actions of a shortest path from pos to target (the
+    one getNextAction follows), or None if target cannot be reached.
+    """
+    self._loadNextHops()
+    index = self._cells.index
+    if pos not in index or target not in index:
+      raise Exception("Positions not in grid: " + str((pos, target)))
+    cell, goal = index[pos], index[target]
+    path = []
+    while cell != goal:
+      hop = hopEntry(self._nextHops, cell, goal)
+      if hop < 0:
+        return None
+      path.append(NEIGHBOR_DIRECTIONS[hop])
+      cell = self._cells.steps[cell][hop]
+    return path
+
+  def _loadNextHops(self):
+    if self._nextHops is None:
+      self._nextHops = getLayoutTable(self.dc.layout, 'nextHops')
+      self._cells = getCellIndex(self.dc.layout.walls)
+
+  ##################
+  # Side distances #
+  ##################
+
+  def getSideDistance(self, pos1, pos2, red):
+    """
+    Returns the length of the shortest path from pos1 to pos2 that never
+    leaves the red half of the board (or the blue half if red is False),
+    as walked by a ghost that stays home.  Returns None if either position
+    is on the other half, and sys.maxsize if there is no such path.
+    """
+    table = self._getSideTable('redDistances' if red else 'blueDistances')
+    index = self._cells.index
+    if pos1 not in index or pos2 not in index:
+      raise Exception("Positions not in grid: " + str((pos1, pos2)))
+    # Cells are numbered column by column, so a half is a range of numbers.
+    offset = 0 if red else len(self._cells) - len(table)
+    i, j = index[pos1] - offset, index[pos2] - offset
+    if not (0 <= i < len(table) and 0 <= j < len(table)):
+      return None
+    distance = int(table[i, j])
+    if distance == UNREACHABLE:
+      return sys.maxsize
+    return distance
+
+  def getBorderDistance(self, pos, red):
+    """
+    Returns the maze distance from pos to the nearest border cell of the red
+    half (or the blue half if red is False): how far a Pacman of that team
+    is from getting home.  sys.maxsize if no border cell can be reached.
+    """
+    table = self._getSideTable('borderDistances')
+    index = self._cells.index
+    if pos not in index:
+      raise Exception("Position not in grid: " + str(pos))
+    distance = int(table[0 if red else 1, index[pos]])
+    if distance == UNREACHABLE:
+      return sys.maxsize
+    return distance
+
+  def getBorderCells(self, red):
+    """
+    Returns the open cells of the red half (or blue half) in the column
+    next to the center line, where a Pacman coming home is safe again.
+    """
+    return getBorderCells(self.dc.layout, red)
+
+  def _getSideTable(self, name):
+    if name not in self._sideTables:
+      self._sideTables[name] = getLayoutTable(self.dc.layout, name)
+      self._cells = getCellIndex(self.dc.layout.walls)
+    return self._sideTables[name]
+
+class DistanceField:
+  """
+  The maze distance from every cell to the nearest member of a set of cells,
+  such as the food an agent is after.
+
+  The field is built with one breadth-first search from all members at
+  once, and kept up to date as members are removed (food eaten) or added
+  (food dumped by a dying Pacman), touching only the cells whose nearest
+  member changes.  Reading it is a single lookup:
+
+  field = DistanceField(layout, foodList)
+  field.getDistance(myPos)
+  field.update(newFoodList)
+  """
+  def __init__(self, layout, members=()):
+    self.cells = getCellIndex(layout.walls)
+    self.members = set()
+    # Per cell index: distance to, and index of, the nearest member, or None.
+    self.distances = [None] * len(self.cells)
+    self.owners = [None] * len(self.cells)
+    self._spread([self._add(member) for member in members])
+
+  def getDistance(self, pos):
+    """
+    Returns the maze distance from pos to the nearest member, or None if no
+    member can be reached.
+    """
+    return self.distances[self.cells.index[pos]]
+
+  def getNearest(self, pos):
+    """
+    Returns the member nearest to pos, or None if no member can be reached.
+    """
+    owner = self.owners[self.cells.index[pos]]
+    if owner is None:
+      return None
+    return self.cells.cells[owner]
+
+  def add(self, pos):
+    if pos not in self.members:
+      self._spread([self._add(pos)])
+
+  def remove(self, pos):
+    if pos not in self.members:
+      return
+    self.members.remove(pos)
+    removed = self.cells.index[pos]
+
+    # Forget every cell that was nearest to the removed member...
+    lost = [removed]
+    self.distances[removed] = self.owners[removed] = None
+    for cell in lost:
+      for neighbor in self.cells.neighbors[cell]:
+        if self.owners[neighbor] == removed:
+          self.distances[neighbor] = self.owners[neighbor] = None
+          lost.append(neighbor)
+
+    # ...and fill them in again from the cells around them.
+    border = []
+    for cell in lost:
+      for neighbor in self.cells.neighbors[cell]:
+        if self.distances[neighbor] is not None:
+          border.append((self.distances[neighbor], neighbor))
+    self._spread(border)
+
+  def update(self, members):
+    """
+    Makes the members exactly those in members, adding and removing the
+    differences only.
+    """
+    members = set(members)
+    for pos in self.members - members:
+      self.remove(pos)
+    for pos in members - self.members:
+      self.add(pos)
+
+  def _add(self, pos):
+    self.members.add(pos)
+    cell = self.cells.index[pos]
+    self.distances[cell] = 0
+    self.owners[cell] = cell
+    return (0, cell)
+
+  def _spread(self, seeds):
+    """
+    Dijkstra from the (distance, cell) pairs in seeds, whose distances are
+    already set, lowering the distance of every cell it improves.
+    """
+    heapq.heapify(seeds)
+    distances, owners, neighbors = self.distances, self.owners, self.cells.neighbors
+    while seeds:
+      distance, cell = heapq.heappop(seeds)
+      if distance != distances[cell]:
+        continue # Improved after it was queued
+      for neighbor in neighbors[cell]:
+        if distances[neighbor] is None or distance + 1 < distances[neighbor]:
+          distances[neighbor] = distance + 1
+          owners[neighbor] = owners[cell]
+          heapq.heappush(seeds, (distance + 1, neighbor))
 
 def manhattanDistance(x, y ):
   return abs( x[0] - y[0] ) + abs( x[1] - y[1] )
@@ -88,65 +397,479 @@ def getGrids1D(x):
 # MACHINERY FOR COMPUTING MAZE DISTANCES #
 ##########################################
 
+# Stored for pairs of cells that cannot reach each other.
+UNREACHABLE = -1
+
+# The four moves between neighbouring cells, as numbered in next hop tables.
+NEIGHBOR_DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+NEIGHBOR_VECTORS = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+class CellIndex:
+  """
+  Numbers the open cells of a layout 0..n-1, so that per-cell data can be
+  kept in dense arrays instead of dicts keyed by position.
+
+  Cells are numbered in walls.asList(False) order, i.e. column by column.
+  """
+  def __init__(self, walls):
+    self.width = walls.width
+    self.height = walls.height
+    self.cells = walls.asList(False)
+    self.index = {cell: i for i, cell in enumerate(self.cells)}
+
+    # Neighbours in the order computeDistances has always expanded them,
+    # which is also the order of NEIGHBOR_DIRECTIONS.
+    # steps holds, per direction, the neighbour's index or None for a wall.
+    self.steps = []
+    self.neighbors = []
+    for x, y in self.cells:
+      steps = tuple(self.index.get((x + dx, y + dy)) for dx, dy in NEIGHBOR_VECTORS)
+      self.steps.append(steps)
+      self.neighbors.append(tuple(i for i in steps if i is not None))
+
+  def __len__(self):
+    return len(self.cells)
+
+  def neighborArrays(self):
+    """
+    Returns four arrays, one per direction, holding the neighbour index of
+    every cell, or n (one past the last cell) where there is a wall.
+    """
+    n = len(self.cells)
+    arrays = []
+    for dx, dy in NEIGHBOR_VECTORS:
+      arrays.append(np.array([self.index.get((x + dx, y + dy), n) for x, y in self.cells], dtype=np.intp))
+    return arrays
+
+cellIndexMap = {}
+
+def getCellIndex(walls):
+  if walls not in cellIndexMap:
+    cellIndexMap[walls] = CellIndex(walls)
+  return cellIndexMap[walls]
+
+##################################
+# ON-DISK CACHE OF LAYOUT TABLES #
+##################################
+
+def defaultCacheDir():
+  base = os.environ.get('XDG_CACHE_HOME', '')
+  if not os.path.isabs(base):
+    base = os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(base, 'pacman-distances')
+
+CACHE_DIR = os.environ.get('PACMAN_DISTANCE_CACHE', defaultCacheDir())
+
+# Bump when the contents or layout of a cached table change.
+CACHE_VERSION = 2
+
+def wallsKey(walls):
+  """
+  A hash of the walls that, unlike hash(walls), is the same in every
+  process and every run.
+  """
+  digest = hashlib.sha1(('%d,%d\n' % (walls.width, walls.height)).encode())
+  digest.update(str(walls).encode())
+  return digest.hexdigest()
+
+def _cacheDirIsSafe(create=False):
+  """
+  Whether tables may be read from and written to CACHE_DIR, creating it
+  (readable by the user alone) first if create is set.  Tables are
+  memory-mapped and trusted, so a directory owned by someone else, or that
+  others may write to, is not used.
+  """
+  if not CACHE_DIR:
+    return False
+  try:
+    if create:
+      os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    info = os.stat(CACHE_DIR)
+  except OSError:
+    return False
+  if hasattr(os, 'getuid') and info.st_uid != os.getuid():
+    return False
+  return stat.S_ISDIR(info.st_mode) and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+def _cachePath(walls, name):
+  return os.path.join(CACHE_DIR, 'v%d-%s-%s.npy' % (CACHE_VERSION, wallsKey(walls), name))
+
+def loadTable(walls, name):
+  """
+  Returns the cached table called name for these walls as a read-only
+  memory-mapped array, or None if it has not been stored yet.
+  """
+  if not _cacheDirIsSafe():
+    return None
+  try:
+    return np.load(_cachePath(walls, name), mmap_mode='r')
+  except (OSError, ValueError):
+    return None
+
+def storeTable(walls, name, table):
+  """
+  Writes table to the cache.  The file is written under a temporary name
+  and then renamed, so concurrent games never read a partial table.
+  Failing to write is not an error; the table is simply recomputed later.
+  """
+  if not _cacheDirIsSafe(create=True):
+    return
+  try:
+    fd, tmpPath = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        np.save(f, table)
+      os.chmod(tmpPath, 0o644)
+      os.replace(tmpPath, _cachePath(walls, name))
+    except BaseException:
+      os.remove(tmpPath)
+      raise
+  except OSError:
+    pass
+
 distanceMap = {}
 
+# The most rows of the distance table computed at a time in anytime mode.
+ROW_BATCH = 32
+
 class DistanceCalculator:
   def __init__(self, layout, distancer, default = 10000):
     self.layout = layout
     self.distancer = distancer
     self.default = default
 
-  def run(self):
-    global distanceMap
+    # Anytime mode: the distance table being filled in, and how many of its
+    # rows are done.  Rows are computed in order.
+    self.rows = None
+    self.rowsDone = 0
+    self.thread = None
+    # Rows in the last batch and the seconds each took, to size the next
+    # batch so that it ends within the time limit.
+    self.batchRows = 0
+    self.rowTime = None
 
-    if self.layout.walls not in distanceMap:
-      distances = computeDistances(self.layout)
-      distanceMap[self.layout.walls] = distances
+  def run(self, timeLimit=None, background=False):
+    blocking = timeLimit is None and not background
+    distances = getLayoutTable(self.layout, 'distances', compute=blocking)
+    self.distancer._cells = getCellIndex(self.layout.walls)
+    if distances is not None:
+      self.distancer._distances = distances
+      return
+
+    n = len(self.distancer._cells)
+    self.rows = np.full((storedRows(self.layout, n), n), UNREACHABLE, dtype=distanceType(n))
+    self.rowsDone = 0
+    if background:
+      self.thread = threading.Thread(target=self.resume, name='DistanceCalculator', daemon=True)
+      self.thread.start()
     else:
-      distances = distanceMap[self.layout.walls]
+      self.resume(timeLimit)
+
+  def resume(self, timeLimit=None):
+    """
+    Computes batches of rows until all are done or timeLimit seconds have
+    passed, then publishes the table once it is complete.
+    """
+    if self.layout.walls in distanceMap:
+      # Another Distancer finished the same table meanwhile.
+      self.distancer._distances = distanceMap[self.layout.walls]
+      return
+
+    start = time.time()
+    cells = self.distancer._cells
+    n = len(self.rows)
+    while self.rowsDone < n:
+      batch = ROW_BATCH
+      if timeLimit is not None:
+        # One row to start with, then at most twice the last batch.  Rows
+        # vary in cost, so a batch gets half of the time left as the time
+        # per row measured so far reckons it, down to a single row, and no
+        # batch starts that would not fit.
+        left = timeLimit - (time.time() - start)
+        if self.rowTime is None:
+          batch = 1 if left > 0 else 0
+        elif self.rowTime > left:
+          batch = 0
+        else:
+          batch = max(1, min(ROW_BATCH, 2 * self.batchRows, int(left / (2 * self.rowTime))))
+        if batch == 0:
+          return
+      batchStart = time.time()
+      sources = np.arange(self.rowsDone, min(n, self.rowsDone + batch))
+      self.rows[sources] = computeDistanceRows(cells, sources)
+      self.rowsDone = int(sources[-1]) + 1
+      self.batchRows = len(sources)
+      self.rowTime = (time.time() - batchStart) / len(sources)
+
+    distanceMap[self.layout.walls] = self.rows
+    storeTable(self.layout.walls, 'distances', self.rows)
+    self.distancer._distances = self.rows
+
+#########################
+# POINT SYMMETRIC MAZES #
+#########################
+
+# On a layout whose walls are point symmetric (Layout.isPointSymmetric),
+# turning the board half a turn reverses the CellIndex order: cell i
+# becomes cell n-1-i.  So distance(i, j) == distance(n-1-i, n-1-j), and
+# cell-by-cell tables keep only their first storedRows rows, the others
+# being read through that transform.
+
+def storedRows(layout, n):
+    """
+    The number of rows kept of an n x n per-cell table of layout.
+    """
+    return (n + 1) // 2 if layout.isPointSymmetric() else n
+
+def sidesMirror(layout):
+    """
+    Whether half a turn swaps the red and blue halves of layout, making
+    the blue half's tables the red half's read backwards.
+    """
+    return layout.isPointSymmetric() and layout.width % 2 == 0
+
+def storedRow(table, i):
+    # The row of table that row i is read from.
+    rows, n = table.shape
+    return i if i < rows else n - 1 - i
+
+def tableEntry(table, i, j):
+    """
+    Entry [i, j] of a per-cell table that may keep only half of its rows.
+    """
+    rows, n = table.shape
+    if i < rows:
+      return table[i, j]
+    return table[n - 1 - i, n - 1 - j]
+
+def tableRow(table, i):
+    """
+    Row i of a per-cell table that may keep only half of its rows, as an
+    array (a view when possible).
+    """
+    rows, n = table.shape
+    if i < rows:
+      return table[i]
+    return table[n - 1 - i, ::-1]
+
+def unfoldTable(table):
+    """
+    The whole of a per-cell table that may keep only half of its rows.
+    """
+    rows, n = table.shape
+    if rows == n:
+      return table
+    return np.vstack([table, table[:n - rows][::-1, ::-1]])
 
-    self.distancer._distances = distances
+# Half a turn swaps North with South and East with West, i.e. bits 0 and 1
+# and bits 2 and 3 of a next hop entry.
+MIRRORED_HOPS = np.array([((m & 1) << 1) | ((m & 2) >> 1) | ((m & 4) << 1) | ((m & 8) >> 1)
+                          for m in range(16)], dtype=np.int8)
+# The preferred move of a next hop entry: the lowest bit set, or -1.
+FIRST_HOP = [next((d for d in range(4) if m & (1 << d)), -1) for m in range(16)]
+
+def hopEntry(nextHops, i, j):
+    """
+    The index into NEIGHBOR_DIRECTIONS of the first move from cell i to
+    cell j in a next hop table, or -1 if there is none.
+    """
+    rows, n = nextHops.shape
+    if i < rows:
+      return FIRST_HOP[nextHops[i, j]]
+    return FIRST_HOP[MIRRORED_HOPS[nextHops[n - 1 - i, n - 1 - j]]]
+
+def distanceType(n):
+    return np.int16 if n < np.iinfo(np.int16).max else np.int32
 
 def computeDistances(layout):
-    "Runs UCS to all other positions from each position"
-    distances = {}
-    allNodes = layout.walls.asList(False)
-    for source in allNodes:
-        dist = {}
-        closed = {}
-        for node in allNodes:
-            dist[node] = sys.maxsize
-        import util
-        queue = util.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
-                continue
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
-            if not layout.isWall((x,y+1)):
-                adjacent.append((x,y+1))
-            if not layout.isWall((x,y-1)):
-                adjacent.append((x,y-1) )
-            if not layout.isWall((x+1,y)):
-                adjacent.append((x+1,y) )
-            if not layout.isWall((x-1,y)):
-                adjacent.append((x-1,y))
-            for other in adjacent:
-                if not other in dist:
-                    continue
-                oldDist = dist[other]
-                newDist = nodeDist+1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
-    return distances
+    """
+    Returns an n x n matrix, n being the number of open cells, where entry
+    [i, j] is the maze distance between cells i and j of the layout's
+    CellIndex, or UNREACHABLE.  On point symmetric layouts only the first
+    half of the rows is computed and kept (see tableEntry).
+    """
+    cells = getCellIndex(layout.walls)
+    return computeDistanceRows(cells, np.arange(storedRows(layout, len(cells))))
+
+def computeDistanceRows(cells, sources):
+    """
+    Returns the rows of the distance matrix for the cells numbered sources.
+
+    The search runs on the junction graph of the maze, where a corridor is a
+    single edge, and the rows are filled in from the distances between its
+    nodes; see junctionGraph.computeDistanceRows.
+    """
+    # Imported here since junctionGraph builds on this module.
+    import junctionGraph
+    return junctionGraph.computeDistanceRows(junctionGraph.junctionGraphOf(cells), sources)
+
+def computeNextHops(layout):
+    """
+    Returns an n x n table whose entry [i, j] has bit d set when the move
+    NEIGHBOR_DIRECTIONS[d] starts a shortest path from cell i to cell j; it
+    is 0 if i == j or j cannot be reached.  Like the distances, only the
+    first half of the rows is kept on point symmetric layouts, and hopEntry
+    reads the first move from it.
+
+    Moving from i to its neighbour u is a first step of a shortest path to j
+    exactly when distance(u, j) == distance(i, j) - 1, so the table follows
+    from the distance table with one comparison per direction.
+    """
+    cells = getCellIndex(layout.walls)
+    distances = unfoldTable(getLayoutTable(layout, 'distances'))
+    n = len(cells)
+    rows = storedRows(layout, n)
+    nextHops = np.zeros((rows, n), dtype=np.int8)
+    # Walls are neighbour n, whose row never matches distance - 1.
+    padded = np.vstack([distances, np.full((1, n), UNREACHABLE, dtype=distances.dtype)])
+    reachable = distances[:rows] > 0
+    for direction, neighbors in enumerate(cells.neighborArrays()):
+      onPath = reachable & (padded[neighbors[:rows]] == distances[:rows] - 1)
+      nextHops[onPath] |= 1 << direction
+    return nextHops
+
+def getBorderCells(layout, red):
+    """
+    The open cells of a half in the column next to the center line, in
+    CellIndex order.
+    """
+    x = layout.width // 2 - 1 if red else layout.width // 2
+    return [(x, y) for y in range(layout.height) if not layout.walls[x][y]]
+
+def computeSideDistances(layout, red):
+    """
+    Returns the distance matrix of the red (or blue) half on its own, as if
+    the other half were walled off.  Its cells are numbered as in the
+    layout's CellIndex, minus the number of cells of the red half for blue.
+    """
+    walls = layout.walls.copy()
+    half = layout.width // 2
+    otherHalf = range(half, layout.width) if red else range(half)
+    for x in otherHalf:
+      walls[x] = [True] * layout.height
+    cells = CellIndex(walls)
+    return computeDistanceRows(cells, np.arange(len(cells)))
+
+def computeRedDistances(layout):
+    return computeSideDistances(layout, True)
+
+def computeBlueDistances(layout):
+    if sidesMirror(layout):
+      return getLayoutTable(layout, 'redDistances')[::-1, ::-1]
+    return computeSideDistances(layout, False)
+
+def computeBorderDistances(layout):
+    """
+    Returns a 2 x n table with, for every cell, the maze distance to the
+    nearest border cell of the red half (row 0) and of the blue half (row 1).
+    """
+    cells = getCellIndex(layout.walls)
+    distances = getLayoutTable(layout, 'distances')
+    borderDistances = np.full((2, len(cells)), UNREACHABLE, dtype=distances.dtype)
+    for row, red in enumerate([True, False]):
+      border = [cells.index[cell] for cell in getBorderCells(layout, red)]
+      if not border:
+        continue
+      toBorder = np.array([tableRow(distances, i) for i in border], dtype=np.int64)
+      toBorder[toBorder == UNREACHABLE] = sys.maxsize
+      nearest = toBorder.min(axis=0)
+      borderDistances[row, nearest != sys.maxsize] = nearest[nearest != sys.maxsize]
+    return borderDistances
+
+def computeTopology(layout):
+    # Imported here since mazeTopology builds on this module.
+    import mazeTopology
+    return mazeTopology.computeTopology(layout)
+
+def computeLandmarkDistances(layout):
+    # Imported here since landmarks builds on this module.
+    import landmarks
+    return landmarks.computeLandmarkDistances(layout)
+
+#####################
+# PER-LAYOUT TABLES #
+#####################
+
+# For every kind of table: the in-process map from walls to table, and the
+# function computing the table from a layout.
+nextHopMap = {}
+redDistanceMap = {}
+blueDistanceMap = {}
+borderDistanceMap = {}
+topologyMap = {}
+landmarkMap = {}
+
+LAYOUT_TABLES = {
+  'distances': (distanceMap, computeDistances),
+  'nextHops': (nextHopMap, computeNextHops),
+  'redDistances': (redDistanceMap, computeRedDistances),
+  'blueDistances': (blueDistanceMap, computeBlueDistances),
+  'borderDistances': (borderDistanceMap, computeBorderDistances),
+  'topology': (topologyMap, computeTopology),
+  'landmarkDistances': (landmarkMap, computeLandmarkDistances),
+}
+
+def getLayoutTable(layout, name, compute=True):
+  """
+  Returns the table called name for layout, from this process, shared
+  memory or the disk cache if possible, and computing it otherwise.
+  With compute=False, returns None instead of computing it.
+  """
+  tables, computeTable = LAYOUT_TABLES[name]
+  walls = layout.walls
+  if walls not in tables:
+    table = loadTable(walls, name)
+    if table is None:
+      if not compute:
+        return None
+      table = computeTable(layout)
+      storeTable(walls, name, table)
+    tables[walls] = table
+  return tables[walls]
+
+# Shared memory blocks this process created or attached to.  They have to
+# stay open for as long as arrays backed by them are in use.
+_sharedBlocks = {}
+
+def shareTables(layout):
+  """
+  Copies every table of layout into shared memory, so that other processes
+  can use them through attachTables without computing or copying them.
+
+  Returns a picklable list of handles to hand to those processes.  Call
+  releaseTables with it once they are done.
+  """
+  handles = []
+  for name in LAYOUT_TABLES:
+    table = getLayoutTable(layout, name)
+    block = shared_memory.SharedMemory(create=True, size=max(1, table.nbytes))
+    np.ndarray(table.shape, table.dtype, buffer=block.buf)[...] = table
+    _sharedBlocks[block.name] = block
+    handles.append((layout.walls, name, block.name, table.shape, table.dtype.str))
+  return handles
+
+def attachTables(handles):
+  """
+  Makes the tables published by shareTables available to every Distancer
+  in this process, as read-only views of the shared memory.
+  """
+  for walls, name, blockName, shape, dtype in handles:
+    block = shared_memory.SharedMemory(name=blockName)
+    table = np.ndarray(shape, dtype, buffer=block.buf)
+    table.flags.writeable = False
+    _sharedBlocks[blockName] = block
+    LAYOUT_TABLES[name][0][walls] = table
+
+def releaseTables(handles):
+  """
+  Frees the shared memory behind handles.  Only the process that called
+  shareTables should do this, after all other processes are done.
+  """
+  for walls, name, blockName, shape, dtype in handles:
+    block = _sharedBlocks.pop(blockName, None)
+    if block is not None:
+      block.close()
+      block.unlink()
 
 
 def getDistanceOnGrid(distances, pos1, pos2):
@@ -154,4 +877,3 @@ def getDistanceOnGrid(distances, pos1, pos2):
     if key in distances:
       return distances[key]
     return 100000
-
@@ -21,6 +21,9 @@
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
 import enum
+import itertools
+import operator
+import random
 import sys
 import time
 import traceback
@@ -92,12 +95,28 @@ class Configuration:
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    Configurations are never changed once made, since game states share
+    them: a character that moves or turns gets a new one.  Those made by
+    generateSuccessor are interned, one per position and direction.
     """
+    __slots__ = ('pos', 'direction')
 
     def __init__(self, pos: tuple[int, int], direction: Directions):
         self.pos = pos
         self.direction = direction
 
+    @staticmethod
+    def intern(pos: tuple[int, int], direction: Directions) -> 'Configuration':
+        """
+        Returns the one interned configuration at pos facing direction.
+        """
+        key = (pos, direction)
+        config = _configurations.get(key)
+        if config is None:
+            config = _configurations[key] = Configuration(pos, direction)
+        return config
+
     def getPosition(self) -> tuple[int, int]:
         return self.pos
 
@@ -133,12 +152,18 @@ class Configuration:
         direction = Actions.vectorToDirection(vector)
         if direction == Directions.STOP:
             direction = self.direction # There is no stop direction
-        return Configuration((x + dx, y+dy), direction)
+        return Configuration.intern((x + dx, y+dy), direction)
+
+# Interned configurations by (position, direction).  Moves always produce
+# float positions, so these never mix with the integer start positions.
+_configurations = {}
 
 class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer',
+                 'numCarrying', 'numReturned')
 
     def __init__(self, startConfiguration: Configuration, isPacman: bool):
         self.start = startConfiguration
@@ -163,7 +188,9 @@ class AgentState:
         return hash(hash(self.configuration) + 13 * hash(self.scaredTimer))
 
     def copy(self) -> Self:
-        state = AgentState(self.start, self.isPacman)
+        state = AgentState.__new__(AgentState)
+        state.start = self.start
+        state.isPacman = self.isPacman
         state.configuration = self.configuration
         state.scaredTimer = self.scaredTimer
         state.numCarrying = self.numCarrying
@@ -297,6 +324,211 @@ class Grid:
                 bools.append(False)
         return bools
 
+class _ReadOnlyList(list):
+    """
+    A list that refuses every change.  It still compares equal to a list
+    with the same items, and x[:] gives back an ordinary list.
+    """
+    def _readOnly(self, *args, **kwargs):
+        raise TypeError('%s is read-only' % type(self).__name__)
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readOnly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readOnly
+
+    def __reduce__(self):
+        # The default pickling of a list subclass would append the items.
+        return type(self), (list(self),)
+
+class FrozenGrid(Grid):
+    """
+    A Grid that cannot be changed, for the walls and food of a layout,
+    which every game state and observation shares: both grid[x] = column
+    and grid[x][y] = value raise TypeError.  copy and deepCopy return an
+    ordinary Grid to change.
+    """
+    def __init__(self, grid: Grid):
+        self.CELLS_PER_INT = grid.CELLS_PER_INT
+        self.width = grid.width
+        self.height = grid.height
+        self.data = _ReadOnlyList(_ReadOnlyList(column) for column in grid.data)
+
+    def __setitem__(self, key: int, item: list[bool]) -> None:
+        raise TypeError('FrozenGrid is read-only')
+
+    def copy(self) -> Grid:
+        g = Grid(self.width, self.height)
+        g.data = [x[:] for x in self.data]
+        return g
+
+class BitGrid(Grid):
+    """
+    A Grid of booleans backed by a single int, bit x * height + y holding
+    cell (x, y).  grid[x][y] reads and writes as with a Grid, but count is a
+    popcount, asList walks the set bits only, and copy is O(1) since ints
+    are immutable: a copy shares the int until either side changes a cell.
+
+    Use BitGrid.fromGrid to convert a Grid.
+    """
+    def __init__(self,
+                 width: int, height: int,
+                 initialValue: bool = False,
+                 bitRepresentation=None):
+        if initialValue not in [False, True]:
+            raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
+        self._columns = None
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    @classmethod
+    def fromGrid(cls, grid: Grid) -> Self:
+        if isinstance(grid, BitGrid):
+            return grid.copy()
+        g = cls(grid.width, grid.height)
+        bits = 0
+        for x in range(grid.width - 1, -1, -1):
+            for y in range(grid.height - 1, -1, -1):
+                bits = (bits << 1) | bool(grid[x][y])
+        g.bits = bits
+        return g
+
+    def __getitem__(self, i: int) -> '_BitColumn':
+        if self._columns is None:
+            self._columns = [_BitColumn(self, x) for x in range(self.width)]
+        return self._columns[i]
+
+    def __setitem__(self, key: int, item: list[bool]) -> None:
+        key = operator.index(key)
+        if key < 0: key += self.width
+        offset = key * self.height
+        column = 0
+        for y in range(self.height - 1, -1, -1):
+            column = (column << 1) | bool(item[y])
+        mask = ((1 << self.height) - 1) << offset
+        self.bits = (self.bits & ~mask) | (column << offset)
+
+    def get(self, x: int, y: int) -> bool:
+        x, y = operator.index(x), operator.index(y)
+        return (self.bits >> (x * self.height + y)) & 1 == 1
+
+    def set(self, x: int, y: int, value: bool) -> None:
+        # operator.index takes numpy integers as ints and refuses floats,
+        # as list indices do; a numpy shift would overflow the bits.
+        x, y = operator.index(x), operator.index(y)
+        if value:
+            self.bits |= 1 << (x * self.height + y)
+        else:
+            self.bits &= ~(1 << (x * self.height + y))
+
+    @property
+    def data(self) -> list[list[bool]]:
+        # A list of lists snapshot, for code written against Grid.data.
+        return [[self.get(x, y) for y in range(self.height)] for x in range(self.width)]
+
+    def __str__(self) -> str:
+        out = [[str(self.get(x, y))[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other) -> bool:
+        if other is None: return False
+        if isinstance(other, BitGrid):
+            return self.bits == other.bits and self.height == other.height and self.width == other.width
+        return self.data == other.data
+
+    def __hash__(self) -> int:
+        # The same int Grid.__hash__ builds, so equal grids hash alike.
+        return hash(self.bits)
+
+    def copy(self) -> Self:
+        g = BitGrid(self.width, self.height)
+        g.bits = self.bits
+        return g
+
+    def shallowCopy(self) -> Self:
+        # Changes are not shared with the copy, as a shared int cannot change.
+        return self.copy()
+
+    def count(self, item: bool = True) -> int:
+        count = self.bits.bit_count()
+        return count if item else self.width * self.height - count
+
+    def asList(self, key: bool = True) -> list[tuple[int, int]]:
+        bits = self.bits if key else ~self.bits & ((1 << (self.width * self.height)) - 1)
+        # The binary digits, lowest first, as 0 and 1 bytes select the
+        # positions without a Python level loop.
+        flags = format(bits, 'b')[::-1].encode().translate(_DIGIT_FLAGS)
+        return list(itertools.compress(_cellPositions(self.width, self.height), flags))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_columns'] = None
+        return state
+
+_DIGIT_FLAGS = bytes.maketrans(b'01', b'\x00\x01')
+
+_cellPositionsMap = {}
+
+def _cellPositions(width, height):
+    # Every (x, y) of a width x height grid, in bit order.
+    if (width, height) not in _cellPositionsMap:
+        _cellPositionsMap[width, height] = [(x, y) for x in range(width) for y in range(height)]
+    return _cellPositionsMap[width, height]
+
+class _BitColumn:
+    """
+    Column x of a BitGrid, so that grid[x][y] works as with a Grid.
+    """
+    __slots__ = ('grid', 'x')
+
+    def __init__(self, grid: BitGrid, x: int):
+        self.grid = grid
+        self.x = x
+
+    def __getitem__(self, y):
+        grid = self.grid
+        if y.__class__ is not int or not 0 <= y < grid.height:
+            return self._getOther(y)
+        return (grid.bits >> (self.x * grid.height + y)) & 1 == 1
+
+    def _getOther(self, y):
+        # Slices, negative indices and other integer types, as lists take
+        # them.
+        height = self.grid.height
+        if isinstance(y, slice):
+            return [self[i] for i in range(height)[y]]
+        y = operator.index(y)
+        if y < 0: y += height
+        if not 0 <= y < height:
+            raise IndexError('BitGrid column index out of range')
+        return self.grid.get(self.x, y)
+
+    def __setitem__(self, y: int, value: bool) -> None:
+        height = self.grid.height
+        y = operator.index(y)
+        if y < 0: y += height
+        if not 0 <= y < height:
+            raise IndexError('BitGrid column index out of range')
+        self.grid.set(self.x, y, value)
+
+    def __len__(self) -> int:
+        return self.grid.height
+
+    def __iter__(self):
+        column = self.grid.bits >> (self.x * self.grid.height)
+        for y in range(self.grid.height):
+            yield (column >> y) & 1 == 1
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def count(self, item: bool = True) -> int:
+        return list(self).count(item)
+
 def reconstituteGrid(bitRep: tuple[int, int]) -> Grid:
     if type(bitRep) is not type((1,2)):
         return bitRep
@@ -390,6 +622,42 @@ class Actions:
         x, y = position
         return (x + dx, y + dy)
 
+###################
+# Zobrist hashing #
+###################
+
+# A state's key is the xor of a random 64 bit number per feature it has:
+# the score, every agent's position, direction, scared timer and food
+# carried, and every capsule and pellet.  A move changes few features, so
+# a successor's key is its parent's with a few numbers xored in and out.
+# The numbers come from their own generator so the game's random stream is
+# left alone; they are drawn as features are first seen, so keys are the
+# same within a process but not across processes.
+_zobristRandom = random.Random(0x5eed)
+_zobristKeys = {}
+
+def zobristKey(feature: tuple) -> int:
+    key = _zobristKeys.get(feature)
+    if key is None:
+        key = _zobristKeys[feature] = _zobristRandom.getrandbits(64)
+    return key
+
+def _agentFeature(index: int, configuration: Configuration,
+                  scaredTimer: int, numCarrying: int) -> tuple:
+    if configuration is None:
+        return ('agent', index, None, None, scaredTimer, numCarrying)
+    return ('agent', index, configuration.pos, configuration.direction,
+            scaredTimer, numCarrying)
+
+def _agentKeyChange(index: int, configuration: Configuration, scaredTimer: int,
+                    numCarrying: int, agentState: AgentState) -> int:
+    # What to xor into a key for agent index to go from the given fields
+    # to agentState.
+    old = _agentFeature(index, configuration, scaredTimer, numCarrying)
+    new = _agentFeature(index, agentState.configuration, agentState.scaredTimer,
+                        agentState.numCarrying)
+    return 0 if old == new else zobristKey(old) ^ zobristKey(new)
+
 class GameStateData:
     """
 
@@ -413,11 +681,15 @@ class GameStateData:
         self._lose: bool = False
         self._win: bool = False
         self.scoreChange: int = 0
+        # Zobrist key, computed when first hashed (see updateKey).
+        self._key: int = None
 
     def deepCopy(self) -> Self:
         state = GameStateData( self )
+        state._key = self._key
         state.food = self.food.deepCopy()
-        state.layout = self.layout.deepCopy()
+        # Layouts never change once loaded, so copies share them.
+        state.layout = self.layout
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
         state._foodAdded = self._foodAdded
@@ -435,24 +707,90 @@ class GameStateData:
         Allows two states to be compared.
         """
         if other == None: return False
+        if self is other: return True
         # TODO Check for type of other
+        # Different keys mean different states; equal keys prove nothing.
+        if self._key is not None and other._key is not None and self._key != other._key:
+            return False
         if not self.agentStates == other.agentStates: return False
-        if not self.food == other.food: return False
-        if not self.capsules == other.capsules: return False
+        if not [a.numCarrying for a in self.agentStates] == [a.numCarrying for a in other.agentStates]:
+            return False
         if not self.score == other.score: return False
+        if not self.capsules == other.capsules: return False
+        if not self.food == other.food: return False
         return True
 
     def __hash__(self) -> int:
         """
         Allows states to be keys of dictionaries.
+
+        Returns the state's Zobrist key, in O(1) once it is known.  Equal
+        states always have equal keys; two different states have the same
+        hash with probability about 2**-61 (the 64 bit key reduced by
+        Python's hash), and even then __eq__ tells them apart.  A state
+        must not be changed after it has been hashed.
+        """
+        if self._key is None:
+            self._key = self._computeKey()
+        return self._key
+
+    def _computeKey(self) -> int:
+        key = zobristKey(('score', self.score))
+        for index, agentState in enumerate(self.agentStates):
+            key ^= zobristKey(_agentFeature(index, agentState.configuration,
+                                            agentState.scaredTimer, agentState.numCarrying))
+        for capsule in self.capsules:
+            key ^= zobristKey(('capsule', capsule))
+        height = self.food.height
+        for x, y in self.food.asList():
+            key ^= zobristKey(('food', x * height + y))
+        return key
+
+    def updateKey(self, previous: Self, agents: tuple | None = None) -> None:
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        Derives the key of this state from that of previous, the state it
+        was made from, looking only at what changed.  If previous was never
+        hashed, neither is this state until it is needed.
+
+        A state changed in place has no previous agent states to compare:
+        agents then holds (index, configuration, isPacman, scaredTimer,
+        numCarrying, numReturned) as they were, for every agent that may
+        have changed (see capture.MoveRecord).
+        """
+        key = previous._key
+        if key is None or (agents is None and len(self.agentStates) != len(previous.agentStates)):
+            self._key = None
+            return
+        if self.score != previous.score:
+            key ^= zobristKey(('score', previous.score)) ^ zobristKey(('score', self.score))
+        if agents is None:
+            for index, (old, new) in enumerate(zip(previous.agentStates, self.agentStates)):
+                # Agents that did not move share their configuration.
+                if (old.configuration is new.configuration and old.scaredTimer == new.scaredTimer
+                        and old.numCarrying == new.numCarrying):
+                    continue
+                key ^= _agentKeyChange(index, old.configuration, old.scaredTimer,
+                                       old.numCarrying, new)
+        else:
+            agentStates = self.agentStates
+            for index, configuration, isPacman, scaredTimer, numCarrying, numReturned in agents:
+                new = agentStates[index]
+                if (configuration is new.configuration and scaredTimer == new.scaredTimer
+                        and numCarrying == new.numCarrying):
+                    continue
+                key ^= _agentKeyChange(index, configuration, scaredTimer, numCarrying, new)
+        if self.capsules != previous.capsules:
+            for capsule in previous.capsules + self.capsules:
+                key ^= zobristKey(('capsule', capsule))
+        if not (isinstance(self.food, BitGrid) and isinstance(previous.food, BitGrid)):
+            self._key = self._computeKey()
+            return
+        changed = 0 if self.food.bits is previous.food.bits else self.food.bits ^ previous.food.bits
+        while changed:
+            low = changed & -changed
+            key ^= zobristKey(('food', low.bit_length() - 1))
+            changed ^= low
+        self._key = key
 
     def __str__(self) -> str:
         width, height = self.layout.width, self.layout.height
@@ -510,7 +848,9 @@ class GameStateData:
         """
         Creates an initial game state from a layout array (see layout.py).
         """
-        self.food = layout.food.copy()
+        # A BitGrid, so that successors share the food for free and eating a
+        # pellet only replaces one int.
+        self.food = BitGrid.fromGrid(layout.food)
         #self.capsules = []
         self.capsules = layout.capsules[:]
         self.layout = layout
@@ -0,0 +1,334 @@
+# junctionGraph.py
+# ----------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A maze with its corridors contracted: junctions and dead ends are the
+nodes, and every corridor between two of them is one weighted edge.  Most
+open cells of a capture layout sit in a corridor, so searching this graph
+expands far fewer states than searching cells.
+
+Example:
+graph = getJunctionGraph(gameState.data.layout.walls)
+graph.getDistance( (1,1), (10,10) )
+graph.aStarSearch( (1,1), (10,10), heuristic )
+
+Every open cell is either a node or lies on exactly one edge, at some
+offset from the edge's first end (see locate).
+"""
+
+import heapq
+from typing import NamedTuple
+
+import numpy as np
+
+import distanceCalculator
+
+class Edge(NamedTuple):
+    """
+    A corridor between nodes start and end (the same node for a loop),
+    length steps long.  cells are the corridor's cells in order from start;
+    there are length - 1 of them.
+    """
+    start: int
+    end: int
+    length: int
+    cells: tuple
+
+class JunctionGraph:
+    """
+    The junction graph of a maze.
+
+    nodes lists the cells that are nodes, edges the corridors (an Edge
+    each), and adjacency, per node, the (node, edge, length) triples it
+    connects to.
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+        neighbors = self.cells.neighbors
+        n = len(self.cells)
+        nodeOf = [-1] * n
+        self.nodes = []
+        self.edges = []
+        self.adjacency = []
+        # For the cells of corridors, the edge they lie on and their offset.
+        self._edgeOf = [-1] * n
+        self._offset = [0] * n
+        # The arrays of cellArrays, made on first use.
+        self._cellArrays = None
+
+        def addNode(i):
+            nodeOf[i] = len(self.nodes)
+            self.nodes.append(self.cells.cells[i])
+            self.adjacency.append([])
+
+        def addEdges(i):
+            # Walks every corridor leaving cell i that is not known yet.
+            for j in neighbors[i]:
+                if nodeOf[j] >= 0:
+                    # Two nodes next to each other; added once, from the smaller.
+                    if i < j:
+                        self._addEdge(nodeOf[i], nodeOf[j], ())
+                    continue
+                if self._edgeOf[j] >= 0:
+                    continue
+                corridor = []
+                previous, current = i, j
+                while nodeOf[current] < 0:
+                    corridor.append(current)
+                    self._edgeOf[current] = len(self.edges)
+                    self._offset[current] = len(corridor)
+                    a, b = neighbors[current]
+                    previous, current = current, b if a == previous else a
+                self._addEdge(nodeOf[i], nodeOf[current], tuple(corridor))
+
+        for i in range(n):
+            if len(neighbors[i]) != 2:
+                addNode(i)
+        for i in range(n):
+            if nodeOf[i] >= 0:
+                addEdges(i)
+        # Loops without any junction still need one node each.
+        for i in range(n):
+            if nodeOf[i] < 0 and self._edgeOf[i] < 0:
+                addNode(i)
+                addEdges(i)
+
+        self.nodeIndex = {self.nodes[k]: k for k in range(len(self.nodes))}
+
+    def _addEdge(self, start, end, corridor):
+        edge = Edge(start, end, len(corridor) + 1,
+                    tuple(self.cells.cells[i] for i in corridor))
+        e = len(self.edges)
+        self.edges.append(edge)
+        self.adjacency[start].append((end, e, edge.length))
+        if end != start:
+            self.adjacency[end].append((start, e, edge.length))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def cellArrays(self):
+        """
+        Returns (ends, toEnds, edgeOf, offset), arrays over the cells of
+        the CellIndex: ends[0] and ends[1] are the nodes at both ends of each
+        cell's corridor (a node being both ends of itself), toEnds how far
+        away they are, and edgeOf and offset as locate gives them (edgeOf
+        being -1 for a node).  They are made once and shared, so do not
+        change them.
+        """
+        if self._cellArrays is None:
+            n = len(self.cells)
+            ends = np.zeros((2, n), dtype=np.intp)
+            toEnds = np.zeros((2, n), dtype=np.int64)
+            for i, pos in enumerate(self.cells.cells):
+                cellEnds = self.getEnds(pos)
+                if len(cellEnds) == 1:
+                    cellEnds = cellEnds * 2
+                (ends[0, i], toEnds[0, i]), (ends[1, i], toEnds[1, i]) = cellEnds
+            edgeOf = np.array(self._edgeOf, dtype=np.intp)
+            offset = np.array(self._offset, dtype=np.int64)
+            for array in (ends, toEnds, edgeOf, offset):
+                array.flags.writeable = False
+            self._cellArrays = (ends, toEnds, edgeOf, offset)
+        return self._cellArrays
+
+    def locate(self, pos):
+        """
+        Returns (None, node) if pos is a node, and (edge, offset) if it is
+        the offset-th cell (from 1) of an edge's corridor.
+        """
+        if pos in self.nodeIndex:
+            return None, self.nodeIndex[pos]
+        i = self.cells.index[pos]
+        return self._edgeOf[i], self._offset[i]
+
+    def getEnds(self, pos):
+        """
+        Returns the nodes nearest to pos in both directions along its
+        corridor, with their distances: [(node, distance), ...].  A node is
+        its own only end.
+        """
+        return [(node, distance) for node, distance, leg in self._legs(pos)]
+
+    def _legs(self, pos):
+        # Like getEnds, with the stretch of corridor walked to each end as
+        # (edge, first offset, last offset), offsets counted from the start.
+        edge, offset = self.locate(pos)
+        if edge is None:
+            return [(offset, 0, None)]
+        start, end, length, cells = self.edges[edge]
+        return [(start, offset, (edge, offset, 0)),
+                (end, length - offset, (edge, offset, length))]
+
+    ##########
+    # Search #
+    ##########
+
+    def dijkstra(self, sources):
+        """
+        Returns the distance from the nearest of the cells sources to every
+        node, as a list indexed by node, with None for unreachable nodes.
+        """
+        distances = [None] * len(self.nodes)
+        heap = []
+        for source in sources:
+            for node, d in self.getEnds(source):
+                heapq.heappush(heap, (d, node))
+        while heap:
+            d, node = heapq.heappop(heap)
+            if distances[node] is not None:
+                continue
+            distances[node] = d
+            for other, e, length in self.adjacency[node]:
+                if distances[other] is None:
+                    heapq.heappush(heap, (d + length, other))
+        return distances
+
+    def getDistance(self, pos1, pos2):
+        """
+        Returns the maze distance from pos1 to pos2, or None if pos2 cannot
+        be reached.
+        """
+        result = self.aStarSearch(pos1, pos2)
+        return None if result is None else result[0]
+
+    def aStarSearch(self, start, goal, heuristic=None):
+        """
+        A* from cell start to cell goal, expanding only nodes.  heuristic(pos),
+        if given, must be consistent, as Manhattan distance to goal is.
+
+        Returns (distance, path), path being the list of cells from start to
+        goal, both included, or None if goal cannot be reached.
+        """
+        if start == goal:
+            return 0, [start]
+        if heuristic is None:
+            heuristic = lambda pos: 0
+        # The goal is entered from the ends of its corridor, walking the legs
+        # from goal backwards.
+        goalLegs = {}
+        for node, d, leg in self._legs(goal):
+            goalLegs.setdefault(node, []).append((d, leg))
+
+        # Entries are (estimate, distance, tie breaker, node, leg, previous
+        # entry); node None stands for the goal itself.
+        heap = []
+        counter = 0
+        startEdge, startOffset = self.locate(start)
+        goalEdge, goalOffset = self.locate(goal)
+        if startEdge is not None and startEdge == goalEdge:
+            d = abs(startOffset - goalOffset)
+            heap.append((d, d, counter, None, (startEdge, startOffset, goalOffset), None))
+        for node, d, leg in self._legs(start):
+            counter += 1
+            heapq.heappush(heap, (d + heuristic(self.nodes[node]), d, counter, node, leg, None))
+
+        closed = set()
+        while heap:
+            entry = heapq.heappop(heap)
+            f, d, tie, node, leg, previous = entry
+            if node is None:
+                return d, self._expandPath(start, entry)
+            if node in closed:
+                continue
+            closed.add(node)
+            for toGoal, goalLeg in goalLegs.get(node, []):
+                counter += 1
+                reversedLeg = goalLeg and (goalLeg[0], goalLeg[2], goalLeg[1])
+                heapq.heappush(heap, (d + toGoal, d + toGoal, counter, None, reversedLeg, entry))
+            for other, e, length in self.adjacency[node]:
+                if other not in closed:
+                    counter += 1
+                    g = d + length
+                    leg = (e, 0, length) if self.edges[e].start == node else (e, length, 0)
+                    heapq.heappush(heap, (g + heuristic(self.nodes[other]), g, counter, other, leg, entry))
+        return None
+
+    def _expandPath(self, start, entry):
+        legs = []
+        while entry is not None:
+            legs.append(entry[4])
+            entry = entry[5]
+        path = [start]
+        for leg in reversed(legs):
+            if leg is None:
+                continue
+            e, first, last = leg
+            edge = self.edges[e]
+            line = (self.nodes[edge.start],) + edge.cells + (self.nodes[edge.end],)
+            step = 1 if last >= first else -1
+            path.extend(line[i] for i in range(first + step, last + step, step))
+        return path
+
+junctionGraphMap = {}
+
+def getJunctionGraph(walls):
+    return junctionGraphOf(distanceCalculator.getCellIndex(walls))
+
+def junctionGraphOf(cells):
+    """
+    Returns the junction graph of a distanceCalculator.CellIndex.
+    """
+    if cells not in junctionGraphMap:
+        junctionGraphMap[cells] = JunctionGraph(cells)
+    return junctionGraphMap[cells]
+
+##############################
+# DISTANCE TABLES FROM NODES #
+##############################
+
+def computeDistanceRows(graph, sources):
+    """
+    Returns the rows of the distance matrix of graph.cells for the cells
+    numbered sources, as distanceCalculator.computeDistanceRows does, but
+    with one Dijkstra per node instead of one search per cell.
+
+    A path between two cells on different corridors leaves the first by
+    one of its ends and enters the second by one of its ends, so with the
+    node distances the rows are a few array operations.
+    """
+    cells = graph.cells
+    n = len(cells)
+    k = len(sources)
+    distances = np.full((k, n), distanceCalculator.UNREACHABLE,
+                        dtype=distanceCalculator.distanceType(n))
+    if k == 0:
+        return distances
+
+    ends, toEnds, edgeOf, offset = graph.cellArrays()
+
+    # Node to node distances, only from the nodes the sources need: row
+    # rowOf[node] of fromNode is from node.
+    infinity = np.int64(1) << 40
+    needed = np.unique(ends[:, sources])
+    rowOf = np.zeros(len(graph), dtype=np.intp)
+    rowOf[needed] = np.arange(len(needed))
+    fromNode = np.empty((len(needed), len(graph)), dtype=np.int64)
+    for row, node in enumerate(needed.tolist()):
+        nodeDistances = graph.dijkstra([graph.nodes[node]])
+        fromNode[row] = [infinity if d is None else d for d in nodeDistances]
+
+    # Distance from each source to every node, then to every cell.
+    sourceToNode = np.minimum(toEnds[0, sources, None] + fromNode[rowOf[ends[0, sources]]],
+                              toEnds[1, sources, None] + fromNode[rowOf[ends[1, sources]]])
+    rows = np.minimum(sourceToNode[:, ends[0]] + toEnds[0],
+                      sourceToNode[:, ends[1]] + toEnds[1])
+    # Cells on the same corridor can also be joined without leaving it.
+    sameEdge = (edgeOf[sources, None] == edgeOf) & (edgeOf[sources, None] >= 0)
+    along = np.abs(offset[sources, None] - offset)
+    rows = np.where(sameEdge, np.minimum(rows, along), rows)
+    reachable = rows < infinity
+    distances[reachable] = rows[reachable]
+    return distances
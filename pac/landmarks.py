@@ -0,0 +1,148 @@
+# landmarks.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Landmark (ALT) heuristics for A* over a layout.
+
+A few landmark cells are picked per layout and the maze distance from each
+to every cell is stored, k rows of n cells instead of the n x n table.  By
+the triangle inequality |d(L, a) - d(L, b)| <= d(a, b) for every landmark
+L, so the largest such difference is an admissible and consistent
+heuristic, and a much tighter one than Manhattan distance around long
+walls.
+
+Example:
+landmarks = Landmarks(gameState.data.layout)
+landmarks.getLowerBound( (1,1), (10,10) )
+aStarSearch(problem, landmarks.positionHeuristic( (10,10) ))
+"""
+
+import numpy as np
+
+import distanceCalculator
+import util
+
+# Number of landmarks picked per layout.
+LANDMARK_COUNT = 8
+
+class Landmarks:
+    """
+    Lower bounds on maze distances from a layout's landmark table.
+    """
+
+    def __init__(self, layout):
+        self.cells = distanceCalculator.getCellIndex(layout.walls)
+        self.table = distanceCalculator.getLayoutTable(layout, 'landmarkDistances')
+        # Each landmark is the one cell at distance 0 in its row.
+        self.landmarks = [self.cells.cells[i] for i in np.argmax(self.table == 0, axis=1)]
+
+    def getLowerBound(self, pos1, pos2):
+        """
+        Returns a number that is never more than the maze distance from
+        pos1 to pos2, and never less than their Manhattan distance.
+        """
+        index = self.cells.index
+        bound = util.manhattanDistance(pos1, pos2)
+        if pos1 not in index or pos2 not in index:
+            return bound
+        a = self.table[:, index[pos1]]
+        b = self.table[:, index[pos2]]
+        # Landmarks that cannot reach one of the cells tell nothing.
+        known = (a != distanceCalculator.UNREACHABLE) & (b != distanceCalculator.UNREACHABLE)
+        if known.any():
+            bound = max(bound, int(np.abs(a[known].astype(np.int32) - b[known]).max()))
+        return bound
+
+    def getLowerBounds(self, pos, targets):
+        """
+        Returns getLowerBound(pos, target) for every target, as an array.
+        """
+        targets = list(targets)
+        bounds = np.array([util.manhattanDistance(pos, t) for t in targets], dtype=np.int32)
+        index = self.cells.index
+        if pos not in index or not targets:
+            return bounds
+        onGrid = np.array([t in index for t in targets])
+        columns = [index[t] for t in targets if t in index]
+        a = self.table[:, index[pos], None].astype(np.int32)
+        b = self.table[:, columns].astype(np.int32)
+        known = (a != distanceCalculator.UNREACHABLE) & (b != distanceCalculator.UNREACHABLE)
+        differences = np.where(known, np.abs(a - b), 0).max(axis=0, initial=0)
+        bounds[onGrid] = np.maximum(bounds[onGrid], differences)
+        return bounds
+
+    def getLowerBoundToNearest(self, pos, targets):
+        """
+        A lower bound on the maze distance from pos to the nearest of
+        targets, or 0 if there are none: a heuristic for reaching any one.
+        """
+        bounds = self.getLowerBounds(pos, targets)
+        return int(bounds.min()) if len(bounds) else 0
+
+    def getLowerBoundToFarthest(self, pos, targets):
+        """
+        A lower bound on the maze distance from pos to the farthest of
+        targets, or 0 if there are none: a heuristic for visiting them all.
+        """
+        bounds = self.getLowerBounds(pos, targets)
+        return int(bounds.max()) if len(bounds) else 0
+
+    def positionHeuristic(self, goal):
+        """
+        Returns a heuristic(state, problem) for searches whose states are
+        positions and whose goal is the position goal.
+        """
+        return lambda state, problem=None: self.getLowerBound(state, goal)
+
+    def foodHeuristic(self):
+        """
+        Returns a heuristic(state, problem) for searches whose states are
+        (position, food) pairs, food being a grid or a list of positions,
+        and whose goal is to eat all of it.
+        """
+        def heuristic(state, problem=None):
+            position, food = state
+            if hasattr(food, 'asList'):
+                food = food.asList()
+            return self.getLowerBoundToFarthest(position, food)
+        return heuristic
+
+def computeLandmarkDistances(layout):
+    """
+    Returns a LANDMARK_COUNT x n table of the maze distances from the
+    landmarks to every cell (fewer rows on tiny mazes).
+
+    Landmarks are picked farthest first: each is the cell farthest from the
+    ones picked so far, cells that none can reach counting as farthest,
+    so that every part of the maze gets one before any gets two.
+    """
+    cells = distanceCalculator.getCellIndex(layout.walls)
+    n = len(cells)
+    rows = []
+    if n == 0:
+        return np.zeros((0, 0), dtype=distanceCalculator.distanceType(n))
+    # The first landmark is the cell farthest from cell 0.
+    start = distanceCalculator.computeDistanceRows(cells, np.array([0]))[0]
+    candidate = int(np.argmax(start))
+    nearest = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    for _ in range(min(LANDMARK_COUNT, n)):
+        row = distanceCalculator.computeDistanceRows(cells, np.array([candidate]))[0]
+        rows.append(row)
+        reached = row != distanceCalculator.UNREACHABLE
+        nearest[reached] = np.minimum(nearest[reached], row[reached])
+        nearest[candidate] = -1
+        candidate = int(np.argmax(nearest))
+        if nearest[candidate] <= 0:
+            break
+    return np.array(rows)
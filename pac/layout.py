@@ -18,13 +18,21 @@ from functools import reduce
 from typing import Self
 
 import util
+from game import Actions
+from game import Configuration
+from game import Directions
+from game import FrozenGrid
 from game import Grid
 
 VISIBILITY_MATRIX_CACHE = {}
+LEGAL_MOVES_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    A layout is not changed once loaded: game states and their copies all
+    share the one they start from.
     """
 
     def __init__(self, layoutText: list[str]):
@@ -36,6 +44,9 @@ class Layout:
         self.agentPositions: list[tuple[int, tuple[int, int]]] = []
         self.numGhosts = 0
         self.processLayoutText(layoutText)
+        # Shared by every state of every game on the layout, so read-only.
+        self.walls = FrozenGrid(self.walls)
+        self.food = FrozenGrid(self.food)
         self.layoutText = layoutText
         self.totalFood: int = len(self.food.asList())
         # self.initializeVisibilityMatrix()
@@ -64,6 +75,49 @@ class Layout:
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def isPointSymmetric(self) -> bool:
+        """
+        Whether the walls look the same after turning the board half a
+        turn, as in every map mazeGenerator builds.  Then cell (x, y)
+        mirrors (width - 1 - x, height - 1 - y).  Food is not compared.
+        """
+        if not hasattr(self, '_pointSymmetric'):
+            self._pointSymmetric = all(
+                self.walls[x][y] == self.walls[self.width - 1 - x][self.height - 1 - y]
+                for x in range(self.width) for y in range(self.height))
+        return self._pointSymmetric
+
+    def getLegalMoves(self) -> dict[tuple[int, int], tuple[tuple[Directions, ...], dict]]:
+        """
+        Returns the moves possible from every open cell, as
+        {(x, y): (actions, successors)}: actions is the tuple of
+        Actions.getPossibleActions at (x, y), in its order, and successors
+        maps each of them to the position it leads to.  Successor positions
+        are floats, like those Configuration.generateSuccessor makes.
+
+        Positions between cells are not in the table.  Layouts with the same
+        text share one table.
+        """
+        if not hasattr(self, '_legalMoves'):
+            key = '\n'.join(self.layoutText)
+            if key not in LEGAL_MOVES_CACHE:
+                LEGAL_MOVES_CACHE[key] = self._computeLegalMoves()
+            self._legalMoves = LEGAL_MOVES_CACHE[key]
+        return self._legalMoves
+
+    def _computeLegalMoves(self):
+        moves = {}
+        for x in range(self.width):
+            for y in range(self.height):
+                if self.walls[x][y]:
+                    continue
+                config = Configuration((x, y), Directions.STOP)
+                actions = tuple(Actions.getPossibleActions(config, self.walls))
+                successors = {action: config.generateSuccessor(Actions.directionToVector(action)).pos
+                              for action in actions}
+                moves[(x, y)] = (actions, successors)
+        return moves
+
     def isWall(self, pos: tuple[int, int]) -> bool:
         x, col = pos
         return self.walls[x][col]
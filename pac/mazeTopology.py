@@ -0,0 +1,292 @@
+# mazeTopology.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+The shape of a maze, as seen by an agent planning where to go or where to
+guard: how deep into a dead end a cell is, which corridor it belongs to,
+which cells disconnect the maze when blocked, and the fewest cells that
+cut a half off from the center line.
+
+Example:
+topology = MazeTopology(gameState.data.layout)
+topology.getDeadEndDepth( (1,1) )
+topology.getChokepoints(red=True)
+
+Everything but the chokepoints depends on the walls only, is computed in
+linear time and is stored as the 'topology' layout table of
+distanceCalculator, so it shares the disk cache and the competition's
+shared memory with the distance tables.
+"""
+
+from collections import deque
+
+import numpy as np
+
+import distanceCalculator
+
+# Rows of the topology table.
+DEAD_END_DEPTH, CORRIDOR, ARTICULATION = range(3)
+
+class MazeTopology:
+    """
+    Per-cell topology of a layout, looked up by position.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.cells = distanceCalculator.getCellIndex(layout.walls)
+        self.table = distanceCalculator.getLayoutTable(layout, 'topology')
+        self._corridors = None
+        self._chokepoints = {}
+
+    def getDeadEndDepth(self, pos: tuple[int, int]) -> int:
+        """
+        Returns how many steps pos is inside a dead end: 0 for a cell on a
+        loop (or between loops), 1 for the first cell off it, and so on.
+        A Pacman at depth d can be trapped by a ghost d steps behind it.
+        """
+        return int(self.table[DEAD_END_DEPTH, self.cells.index[pos]])
+
+    def getCorridor(self, pos: tuple[int, int]) -> int | None:
+        """
+        Returns the id of the corridor through pos, or None if pos does not
+        have exactly two open neighbours.  A corridor is a maximal run of
+        such cells; ids are numbered from 0.
+        """
+        corridor = int(self.table[CORRIDOR, self.cells.index[pos]])
+        return None if corridor < 0 else corridor
+
+    def getCorridorCells(self, corridor: int) -> list[tuple[int, int]]:
+        """
+        Returns the cells of a corridor, in CellIndex order.
+        """
+        if self._corridors is None:
+            self._corridors = {}
+            for i, c in enumerate(self.table[CORRIDOR].tolist()):
+                if c >= 0:
+                    self._corridors.setdefault(c, []).append(self.cells.cells[i])
+        return self._corridors[corridor]
+
+    def isArticulationPoint(self, pos: tuple[int, int]) -> bool:
+        """
+        Returns whether blocking pos splits the cells around it into parts
+        that can no longer reach each other.
+        """
+        return bool(self.table[ARTICULATION, self.cells.index[pos]])
+
+    def getArticulationPoints(self) -> list[tuple[int, int]]:
+        return [self.cells.cells[i] for i in np.flatnonzero(self.table[ARTICULATION])]
+
+    def getChokepoints(self, red: bool, targets=None) -> list[tuple[int, int]]:
+        """
+        Returns a smallest set of cells of the red half (or blue half) that
+        cuts targets off from the other half: a defender holding all of them
+        keeps invaders away from every target.  Among the smallest sets, the
+        one nearest the center line is returned.
+
+        targets defaults to the food and capsules the layout starts with on
+        that half; pass the current ones (a list of positions) to follow the
+        game.
+        """
+        if targets is None:
+            if red not in self._chokepoints:
+                self._chokepoints[red] = computeChokepoints(
+                    self.layout, red, self._startingTargets(red))
+            return list(self._chokepoints[red])
+        return computeChokepoints(self.layout, red, targets)
+
+    def _startingTargets(self, red):
+        half = self.layout.width // 2
+        targets = self.layout.food.asList() + self.layout.capsules
+        return [(x, y) for x, y in targets if (x < half) == red]
+
+#######################
+# COMPUTING THE INDEX #
+#######################
+
+def computeTopology(layout):
+    """
+    Returns the topology table of layout: one row per quantity (see
+    DEAD_END_DEPTH, CORRIDOR and ARTICULATION), one column per cell of the
+    layout's CellIndex.
+    """
+    cells = distanceCalculator.getCellIndex(layout.walls)
+    table = np.zeros((3, len(cells)), dtype=np.int32)
+    table[DEAD_END_DEPTH] = deadEndDepths(cells)
+    table[CORRIDOR] = corridorIds(cells)
+    table[ARTICULATION] = articulationPoints(cells)
+    return table
+
+def deadEndDepths(cells):
+    """
+    Peels cells with at most one remaining neighbour until only loops and
+    the paths between them are left; a peeled cell's depth is its distance
+    to what is left.  Cells of a part of the maze without any loop keep
+    depth 0, since there is nothing to be trapped away from.
+    """
+    n = len(cells)
+    degree = [len(neighbors) for neighbors in cells.neighbors]
+    peeled = [False] * n
+    leaves = deque(i for i in range(n) if degree[i] <= 1)
+    while leaves:
+        i = leaves.popleft()
+        peeled[i] = True
+        for j in cells.neighbors[i]:
+            if not peeled[j]:
+                degree[j] -= 1
+                if degree[j] == 1:
+                    leaves.append(j)
+
+    depth = [0] * n
+    frontier = deque(i for i in range(n) if not peeled[i])
+    reached = [not p for p in peeled]
+    while frontier:
+        i = frontier.popleft()
+        for j in cells.neighbors[i]:
+            if not reached[j]:
+                reached[j] = True
+                depth[j] = depth[i] + 1
+                frontier.append(j)
+    return depth
+
+def corridorIds(cells):
+    """
+    Labels every maximal connected run of cells with exactly two neighbours
+    with a corridor id, and every other cell with -1.
+    """
+    n = len(cells)
+    inCorridor = [len(neighbors) == 2 for neighbors in cells.neighbors]
+    ids = [-1] * n
+    count = 0
+    for start in range(n):
+        if not inCorridor[start] or ids[start] >= 0:
+            continue
+        ids[start] = count
+        frontier = [start]
+        while frontier:
+            i = frontier.pop()
+            for j in cells.neighbors[i]:
+                if inCorridor[j] and ids[j] < 0:
+                    ids[j] = count
+                    frontier.append(j)
+        count += 1
+    return ids
+
+def articulationPoints(cells):
+    """
+    Marks the articulation points of the maze with Tarjan's depth-first
+    search, run with an explicit stack since a corridor can be deeper than
+    the recursion limit.
+    """
+    n = len(cells)
+    order = [-1] * n
+    low = [0] * n
+    cut = [False] * n
+    counter = 0
+    for root in range(n):
+        if order[root] >= 0:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        rootChildren = 0
+        stack = [(root, -1, iter(cells.neighbors[root]))]
+        while stack:
+            i, parent, neighbors = stack[-1]
+            for j in neighbors:
+                if order[j] < 0:
+                    order[j] = low[j] = counter
+                    counter += 1
+                    if i == root:
+                        rootChildren += 1
+                    stack.append((j, i, iter(cells.neighbors[j])))
+                    break
+                if j != parent:
+                    low[i] = min(low[i], order[j])
+            else:
+                stack.pop()
+                if parent >= 0:
+                    low[parent] = min(low[parent], low[i])
+                    if parent != root and low[i] >= order[parent]:
+                        cut[parent] = True
+        cut[root] = rootChildren > 1
+    return cut
+
+def computeChokepoints(layout, red, targets):
+    """
+    Finds a minimum vertex cut between the other half and targets, inside
+    the red (or blue) half, with unit-capacity augmenting paths over the
+    usual split of every cell into an entry and an exit node.  Each path
+    costs one linear search and there are at most as many as cells on the
+    center line.
+    """
+    cells = distanceCalculator.getCellIndex(layout.walls)
+    half = layout.width // 2
+    inHalf = [(x < half) == red for x, y in cells.cells]
+    # Cells of the half that can be stepped into from the other half.
+    sources = [i for i in range(len(cells))
+               if inHalf[i] and any(not inHalf[j] for j in cells.neighbors[i])]
+    sinks = set(cells.index[t] for t in targets if t in cells.index and inHalf[cells.index[t]])
+
+    # Node 2i enters cell i and 2i+1 leaves it.  Only entering a cell has a
+    # capacity (one), so flow is kept per cell (used) and per pair of
+    # neighbours (net flow from the first to the second).
+    used = [False] * len(cells)
+    flow = {}
+
+    def residualNeighbors(node):
+        i = node >> 1
+        if node & 1 == 0:
+            if not used[i]:
+                yield 2 * i + 1
+            for j in cells.neighbors[i]:
+                if inHalf[j] and flow.get((j, i), 0) > 0:
+                    yield 2 * j + 1
+        else:
+            if used[i]:
+                yield 2 * i
+            for j in cells.neighbors[i]:
+                if inHalf[j]:
+                    yield 2 * j
+
+    def search():
+        parent = {2 * i: None for i in sources}
+        frontier = deque(parent)
+        while frontier:
+            node = frontier.popleft()
+            if node & 1 and node >> 1 in sinks:
+                return parent, node
+            for nextNode in residualNeighbors(node):
+                if nextNode not in parent:
+                    parent[nextNode] = node
+                    frontier.append(nextNode)
+        return parent, None
+
+    while True:
+        reached, node = search()
+        if node is None:
+            break
+        while reached[node] is not None:
+            previous = reached[node]
+            i, j = previous >> 1, node >> 1
+            if i == j:
+                used[i] = node & 1 == 1
+            else:
+                # Pushing along i -> j, or cancelling flow j -> i.
+                flow[(i, j)] = flow.get((i, j), 0) + 1
+                flow[(j, i)] = flow.get((j, i), 0) - 1
+            node = previous
+
+    # Cells whose entry is still reachable but whose exit is not.
+    return [cells.cells[i] for i in range(len(cells))
+            if 2 * i in reached and 2 * i + 1 not in reached]
@@ -49,6 +49,7 @@ from game import Actions
 from game import Action
 from game import Agent
 from game import AgentState
+from game import Configuration
 from game import Directions
 from game import Game
 from game import GameStateData
@@ -130,6 +131,7 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
+        state.data.updateKey(self.data)
         GameState.explored.add(self)
         GameState.explored.add(state)
         return state
@@ -237,7 +239,7 @@ class GameState:
             self.data = GameStateData()
 
     def deepCopy(self) -> Self:
-        state = GameState(self)
+        state = GameState()
         state.data = self.data.deepCopy()
         return state
 
@@ -431,7 +433,8 @@ class GhostRules:
     def decrementTimer(ghostState: AgentState) -> None:
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint( ghostState.configuration.pos )
+            config = ghostState.configuration
+            ghostState.configuration = Configuration( nearestPoint( config.pos ), config.direction )
         ghostState.scaredTimer = max( 0, timer - 1 )
 
     @staticmethod
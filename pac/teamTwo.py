@@ -17,6 +17,7 @@ import util
 from capture import GameState
 from captureAgents import CaptureAgent
 from game import Action
+from game import Actions
 from game import Directions
 
 #################
@@ -175,6 +176,26 @@ class defensiveAgent(agentBase):
     return random.choice(actions)
 
   def moveToTarget(self, gameState: GameState, target: tuple) -> Action:
+      """
+      Moves towards a specified target along a shortest maze path.
+      """
+      myPos = gameState.getAgentPosition(self.index)
+      action = self.distancer.getNextAction(myPos, target)
+      if action is None:
+          return gameState.getLegalActions(self.index)[0]
+
+      # A scared ghost stepping onto an invader is eaten and sent back to
+      # its start, which the table does not know about; look at the
+      # successors then, as this method always did.
+      if gameState.getAgentState(self.index).scaredTimer > 0:
+          nextPos = Actions.getSuccessor(myPos, action)
+          invaders = [gameState.getAgentPosition(i) for i in self.getOpponents(gameState)
+                      if gameState.getAgentState(i).isPacman]
+          if nextPos in invaders:
+              return self.moveToTargetBySuccessors(gameState, target)
+      return action
+
+  def moveToTargetBySuccessors(self, gameState: GameState, target: tuple) -> Action:
       """
       Moves towards a specified target using a basic greedy approach.
       """
@@ -0,0 +1,23 @@
+# conftest.py
+# -----------
+# The game modules import each other by name from the pac directory.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import capture
+import layout
+
+@pytest.fixture
+def state():
+    """
+    A capture game on defaultCapture, at its start.
+    """
+    state = capture.GameState()
+    state.initialize(layout.getLayout('defaultCapture'), 4)
+    state.data.timeleft = 1200
+    return state
@@ -0,0 +1,30 @@
+# test_anytime_distances.py
+# -------------------------
+# In anytime mode the distance table is computed in batches sized from the
+# time rows have taken so far, and no batch starts that would not fit.
+
+import distanceCalculator
+import layout
+
+def newDistancer(monkeypatch):
+    monkeypatch.setattr(distanceCalculator, 'CACHE_DIR', '')
+    monkeypatch.setattr(distanceCalculator, 'distanceMap', {})
+    return distanceCalculator.Distancer(layout.getLayout('defaultCapture'))
+
+def test_no_time_no_rows(monkeypatch):
+    distancer = newDistancer(monkeypatch)
+    distancer.getMazeDistances(timeLimit=0)
+    assert distancer.getMazeDistanceProgress() == 0.0
+
+def test_batches_fit_the_time_per_row(monkeypatch):
+    distancer = newDistancer(monkeypatch)
+    distancer.getMazeDistances(timeLimit=0)
+    # A row is thought to take a second: half a second is not enough.
+    distancer.dc.rowTime = 1.0
+    distancer.dc.batchRows = 1
+    distancer.resumeMazeDistances(0.5)
+    assert distancer.dc.rowsDone == 0
+    distancer.resumeMazeDistances(60)
+    assert distancer.getMazeDistanceProgress() == 1.0
+    assert distancer.isReadyForMazeDistance()
+    assert distancer.dc.batchRows <= distanceCalculator.ROW_BATCH
@@ -0,0 +1,82 @@
+# test_apply_move.py
+# ------------------
+# applyMove changes a state in place into the one generateSuccessor would
+# make, and undoMove puts every agent it changed back, the mover's
+# opponents included when a capsule is eaten or an agent dies.
+
+import pytest
+
+from game import Configuration
+from game import Directions
+
+def place(state, index, position, isPacman, numCarrying=0):
+    agentState = state.data.agentStates[index]
+    agentState.configuration = Configuration(position, Directions.STOP)
+    agentState.isPacman = isPacman
+    agentState.numCarrying = numCarrying
+    state.data._key = None
+
+def fields(state):
+    data = state.data
+    agents = [(a.configuration.pos, a.configuration.direction, a.isPacman,
+               a.scaredTimer, a.numCarrying, a.numReturned) for a in data.agentStates]
+    return (agents, data.food.bits, list(data.capsules), data.score, data.timeleft,
+            data.foodCounts, data.returnedCounts, hash(state))
+
+def checkMove(state, index, action):
+    before = fields(state)
+    agentStates = list(state.data.agentStates)
+    successor = state.generateSuccessor(index, action)
+    record = state.applyMove(index, action)
+    assert fields(state) == fields(successor)
+    assert state.data._key == state.data._computeKey()
+    state.undoMove(record)
+    assert fields(state) == before
+    assert all(a is b for a, b in zip(state.data.agentStates, agentStates))
+    return successor
+
+def test_undo_capsule_scares_back(state):
+    place(state, 0, (24, 10), True)
+    hash(state)
+    successor = checkMove(state, 0, Directions.EAST)
+    assert successor.data._capsuleEaten == (25, 10)
+    assert successor.getAgentState(1).scaredTimer > 0
+    assert state.getAgentState(1).scaredTimer == 0
+
+def test_undo_death_of_opponent(state):
+    place(state, 0, (24, 10), True, numCarrying=3)
+    place(state, 1, (26, 10), False)
+    hash(state)
+    state.applyMove(1, Directions.WEST)
+    # The blue ghost now stands next to the red Pacman; catch it.
+    successor = checkMove(state, 1, Directions.WEST)
+    assert successor.getAgentState(0).configuration == successor.getAgentState(0).start
+    assert successor.data._foodAdded
+
+def test_undo_walk(state):
+    start = fields(state)
+    records = []
+    for ply in range(200):
+        index = ply % 4
+        actions = state.getLegalActions(index)
+        action = actions[ply * 7 % len(actions)]
+        checkMove(state, index, action)
+        records.append(state.applyMove(index, action))
+    for record in reversed(records):
+        state.undoMove(record)
+    assert fields(state) == start
+
+def test_illegal_action_changes_nothing(state):
+    place(state, 0, (24, 10), True)
+    state.applyMove(0, Directions.EAST)
+    assert state.data._capsuleEaten == (25, 10)
+    before = fields(state)
+    key = state.data._key
+    with pytest.raises(Exception, match='Illegal action'):
+        state.applyMove(0, Directions.NORTH)
+    assert fields(state) == before
+    assert state.data._key == key
+    assert state.data._capsuleEaten == (25, 10)
+    assert state._record is None
+    # The state can still move, and undo that move.
+    checkMove(state, 1, state.getLegalActions(1)[0])
@@ -0,0 +1,45 @@
+# test_bitgrid.py
+# ---------------
+# BitGrid must take the same indices a list-backed Grid takes.
+
+import numpy as np
+import pytest
+
+from game import BitGrid
+from game import Grid
+
+def test_numpy_integer_indices():
+    grid = BitGrid(40, 20)
+    grid[30][np.int64(5)] = True
+    grid[np.int32(2)][np.int64(7)] = True
+    grid.set(np.int64(3), np.int8(4), True)
+    assert type(grid.bits) is int
+    assert grid.count() == 3
+    assert grid[30][np.int64(5)] and grid[np.int64(2)][7] and grid.get(np.int64(3), np.int64(4))
+    assert grid[30][np.int64(-15)]
+    grid[30][np.int64(5)] = False
+    assert grid.asList() == [(2, 7), (3, 4)]
+
+def test_numpy_indices_match_grid():
+    grid = Grid(5, 4)
+    bitGrid = BitGrid(5, 4)
+    for x, y in [(np.int64(1), np.int64(2)), (np.int16(4), np.int64(-1))]:
+        grid[x][y] = True
+        bitGrid[x][y] = True
+    assert bitGrid == BitGrid.fromGrid(grid)
+    assert bitGrid.asList() == grid.asList()
+
+@pytest.mark.parametrize('index', [1.0, np.float64(1), '1'])
+def test_non_integer_indices_raise(index):
+    grid = BitGrid(5, 4)
+    with pytest.raises(TypeError):
+        grid[1][index]
+    with pytest.raises(TypeError):
+        grid[1][index] = True
+    with pytest.raises(TypeError):
+        grid.get(index, 1)
+    with pytest.raises(TypeError):
+        grid.set(1, index, True)
+    with pytest.raises(TypeError):
+        grid[index]
+    assert grid.bits == 0
@@ -0,0 +1,33 @@
+# test_capture_food.py
+# --------------------
+# The food of a capture game is a BitGrid; agents index it with whatever
+# integers they compute, numpy ones included.
+
+import numpy as np
+
+from captureAgents import CaptureAgent
+
+def test_get_food_with_numpy_indices(state):
+    agent = CaptureAgent(0)
+    agent.red = True
+    food = agent.getFood(state)
+    x, y = food.asList()[0]
+    assert food[np.int64(x)][np.int64(y)]
+    food[np.int64(x)][np.int64(y)] = False
+    assert not food[x][y]
+    assert food.count() == state.getBlueFoodCount() - 1
+    # getFood hands out a copy: the game's food is untouched.
+    assert state.getBlueFood()[x][y]
+    assert agent.getFood(state).count() == state.getBlueFoodCount()
+
+def test_state_food_with_numpy_indices(state):
+    food = state.data.food
+    x, y = food.asList()[0]
+    count = food.count()
+    assert state.hasFood(np.int64(x), np.int64(y))
+    food[np.int64(x)][np.int64(y)] = False
+    assert type(food.bits) is int
+    assert food.count() == count - 1
+    food[np.int32(x)][np.int32(y)] = True
+    assert food.count() == count and food[x][y]
+    assert food.asList() == state.data.layout.food.asList()
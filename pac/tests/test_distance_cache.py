@@ -0,0 +1,39 @@
+# test_distance_cache.py
+# ----------------------
+# Cached tables are memory-mapped and trusted, so they are only kept in a
+# directory of the user's own that nobody else may write to.
+
+import os
+
+import numpy as np
+
+import distanceCalculator
+import layout
+
+def test_default_cache_dir_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert distanceCalculator.defaultCacheDir() == str(tmp_path / 'pacman-distances')
+    monkeypatch.setenv('XDG_CACHE_HOME', 'relative')
+    assert distanceCalculator.defaultCacheDir() == os.path.join(
+        os.path.expanduser('~'), '.cache', 'pacman-distances')
+
+def test_store_creates_a_private_directory(monkeypatch, tmp_path):
+    cacheDir = tmp_path / 'cache'
+    monkeypatch.setattr(distanceCalculator, 'CACHE_DIR', str(cacheDir))
+    walls = layout.getLayout('defaultCapture').walls
+    table = np.arange(6, dtype=np.int16).reshape(2, 3)
+    distanceCalculator.storeTable(walls, 'test', table)
+    assert cacheDir.stat().st_mode & 0o777 == 0o700
+    assert (distanceCalculator.loadTable(walls, 'test') == table).all()
+
+def test_shared_directory_is_not_used(monkeypatch, tmp_path):
+    cacheDir = tmp_path / 'cache'
+    monkeypatch.setattr(distanceCalculator, 'CACHE_DIR', str(cacheDir))
+    walls = layout.getLayout('defaultCapture').walls
+    table = np.arange(6, dtype=np.int16).reshape(2, 3)
+    distanceCalculator.storeTable(walls, 'test', table)
+    cacheDir.chmod(0o777)
+    assert distanceCalculator.loadTable(walls, 'test') is None
+    distanceCalculator.storeTable(walls, 'other', table)
+    cacheDir.chmod(0o700)
+    assert distanceCalculator.loadTable(walls, 'other') is None
@@ -0,0 +1,49 @@
+# test_layout.py
+# --------------
+# A layout is shared by every state of every game played on it, and by the
+# observations handed to agents, so its walls and food cannot be changed.
+
+import pickle
+
+import pytest
+
+import layout
+from game import Grid
+
+def test_observed_walls_are_read_only(state):
+    walls = state.makeObservation(0).getWalls()
+    x, y = next((x, y) for x in range(walls.width) for y in range(walls.height)
+                if not walls[x][y])
+    with pytest.raises(TypeError):
+        walls[x][y] = True
+    with pytest.raises(TypeError):
+        walls[x] = [True] * walls.height
+    with pytest.raises(TypeError):
+        walls.data[x] = [True] * walls.height
+    assert not state.getWalls()[x][y]
+    assert state.getLegalActions(0) == state.makeObservation(2).getLegalActions(0)
+
+def test_layout_food_is_read_only():
+    food = layout.getLayout('defaultCapture').food
+    x, y = food.asList()[0]
+    with pytest.raises(TypeError):
+        food[x][y] = False
+    with pytest.raises(TypeError):
+        food[x].append(True)
+
+def test_copies_of_layout_walls_can_change():
+    walls = layout.getLayout('defaultCapture').walls
+    copy = walls.copy()
+    assert type(copy) is Grid
+    assert copy == walls and hash(copy) == hash(walls)
+    copy[1][1] = not copy[1][1]
+    copy[2] = [True] * walls.height
+    assert copy != walls
+    assert walls.deepCopy() == walls
+
+def test_layout_walls_pickle():
+    walls = layout.getLayout('defaultCapture').walls
+    loaded = pickle.loads(pickle.dumps(walls))
+    assert loaded == walls
+    with pytest.raises(TypeError):
+        loaded[1][1] = True
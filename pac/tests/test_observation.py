@@ -0,0 +1,34 @@
+# test_observation.py
+# -------------------
+# An observation answers from the state observed until its data is built,
+# and from its data once that exists, so that changes made to it are seen.
+
+from game import Configuration
+from game import Directions
+
+def test_legal_actions_follow_changed_data(state):
+    observation = state.makeObservation(0)
+    assert Directions.SOUTH in observation.getLegalActions(0)
+    observation.data.agentStates[0].configuration = Configuration((3, 1), Directions.STOP)
+    assert observation.getAgentPosition(0) == (3, 1)
+    assert observation.getLegalActions(0) == [Directions.NORTH, Directions.STOP]
+    for action in observation.getLegalActions(0):
+        observation.generateSuccessor(0, action)
+    # The state observed is untouched.
+    assert state.getAgentPosition(0) == (1, 2)
+    assert Directions.SOUTH in state.getLegalActions(0)
+
+def test_score_food_and_capsules_follow_changed_data(state):
+    observation = state.makeObservation(0)
+    observation.data.score = 5
+    x, y = observation.getBlueFood().asList()[0]
+    observation.data.food[x][y] = False
+    capsule = observation.getCapsules()[0]
+    observation.data.capsules = [c for c in observation.data.capsules if c != capsule]
+    assert observation.getScore() == 5
+    assert not observation.hasFood(x, y)
+    assert not observation.getBlueFood()[x][y]
+    assert capsule not in observation.getCapsules()
+    assert state.getScore() == 0
+    assert state.hasFood(x, y)
+    assert capsule in state.getCapsules()